@@ -1,13 +1,13 @@
 import logging
-from random import randint
 from time import time
 from typing import cast
 
+import numpy as np
+
 from geniusweb.actions.Accept import Accept
 from geniusweb.actions.Action import Action
 from geniusweb.actions.Offer import Offer
 from geniusweb.actions.PartyId import PartyId
-from geniusweb.bidspace.AllBidsList import AllBidsList
 from geniusweb.inform.ActionDone import ActionDone
 from geniusweb.inform.Finished import Finished
 from geniusweb.inform.Inform import Inform
@@ -27,7 +27,9 @@ from geniusweb.progress.ProgressTime import ProgressTime
 from geniusweb.references.Parameters import Parameters
 from tudelft_utilities_logging.ReportToLogger import ReportToLogger
 
+from .utils.bid_space import BidSpace
 from .utils.opponent_model import OpponentModel
+from .utils.utility_engine import UtilityEngine
 
 
 class TemplateAgent(DefaultParty):
@@ -40,6 +42,8 @@ class TemplateAgent(DefaultParty):
         self.logger: ReportToLogger = self.getReporter()
 
         self.domain: Domain = None
+        self.bid_space: BidSpace = None
+        self.utility_engine: UtilityEngine = None
         self.parameters: Parameters = None
         self.profile: LinearAdditiveUtilitySpace = None
         self.progress: ProgressTime = None
@@ -81,6 +85,11 @@ class TemplateAgent(DefaultParty):
             self.domain = self.profile.getDomain()
             profile_connection.close()
 
+            # view on all possible bids, only creates the bids that are used
+            self.bid_space = BidSpace(self.domain)
+            # utility function compiled to arrays, to compute the utilities of many bids at once
+            self.utility_engine = UtilityEngine(self.profile, self.bid_space.codec)
+
         # ActionDone informs you of an action (an offer or an accept)
         # that is performed by one of the agents (including yourself).
         elif isinstance(data, ActionDone):
@@ -203,21 +212,60 @@ class TemplateAgent(DefaultParty):
         return all(conditions)
 
     def find_bid(self) -> Bid:
-        # compose a list of all possible bids
-        domain = self.profile.getDomain()
-        all_bids = AllBidsList(domain)
+        # progress of the negotiation session between 0 and 1 (1 is deadline)
+        progress = self.progress.get(time() * 1000)
+
+        # draw random candidate bids and score them all at once according to a heuristic score
+        candidates = self.bid_space.sample(self.get_num_candidates(progress))
+        scores = self.score_bids(candidates, progress)
+
+        # only the best candidate is turned into a bid
+        return self.bid_space.get(candidates[np.argmax(scores)])
+
+    def get_num_candidates(
+        self, progress: float, min_candidates: int = 500, max_candidates: int = 20000
+    ) -> int:
+        """Number of candidate bids to score in a turn, which decreases linearly with the
+        remaining time of the negotiation session. It only depends on the progress, not on
+        the speed of the machine, such that seeded sessions remain reproducible.
+
+        Args:
+            progress (float): progress of the negotiation session
+            min_candidates (int, optional): number of candidates at the deadline. Defaults to 500.
+            max_candidates (int, optional): number of candidates at the start. Defaults to 20000.
+
+        Returns:
+            int: number of candidates
+        """
+        num_candidates = int(max_candidates * (1.0 - progress))
+        return min(max(num_candidates, min_candidates), max_candidates)
 
-        best_bid_score = 0.0
-        best_bid = None
+    def score_bids(
+        self, bid_indices: np.ndarray, progress: float, alpha: float = 0.95, eps: float = 0.1
+    ) -> np.ndarray:
+        """Calculate the heuristic score of `score_bid` for many bids at once
 
-        # take 500 attempts to find a bid according to a heuristic score
-        for _ in range(500):
-            bid = all_bids.get(randint(0, all_bids.size() - 1))
-            bid_score = self.score_bid(bid)
-            if bid_score > best_bid_score:
-                best_bid_score, best_bid = bid_score, bid
+        Args:
+            bid_indices (np.ndarray): indices of the bids in the bid space
+            progress (float): progress of the negotiation session
+            alpha (float, optional): Trade-off factor between self interested and
+                altruistic behaviour. Defaults to 0.95.
+            eps (float, optional): Time pressure factor, balances between conceding
+                and Boulware behaviour over time. Defaults to 0.1.
+
+        Returns:
+            np.ndarray: scores
+        """
+        our_utilities = self.utility_engine.get_utilities_of_codes(bid_indices)
+
+        time_pressure = 1.0 - progress ** (1 / eps)
+        scores = alpha * time_pressure * our_utilities
+
+        if self.opponent_model is not None:
+            opponent_utilities = self.opponent_model.predict_many(bid_indices)
+            scores += (1.0 - alpha * time_pressure) * opponent_utilities
 
-        return best_bid
+        return scores
 
     def score_bid(self, bid: Bid, alpha: float = 0.95, eps: float = 0.1) -> float:
         """Calculate heuristic score for a bid
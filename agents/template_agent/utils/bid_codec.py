@@ -0,0 +1,107 @@
+from math import prod
+from typing import Dict, List
+
+import numpy as np
+
+# codes are stored as int64
+MAX_DOMAIN_SIZE = 2**63 - 1
+
+
+class BidCodec:
+    """Maps the bids of a discrete domain to integers and back, by mixed-radix encoding of
+    the indices of the values of a bid. The last issue changes fastest, so the codes of all
+    bids in `itertools.product` order are 0, 1, 2, ... Bids can be stored as int64 codes
+    instead of dictionaries or Bid objects, e.g. in traces, caches and opponent models.
+
+    The codec does not depend on geniusweb. Bids can be dictionaries of issues to values or
+    geniusweb Bid objects. Decoded bids are dictionaries, use `Bid(codec.decode(code))` to
+    obtain a geniusweb Bid.
+    """
+
+    def __init__(self, issues_values: Dict[str, list]):
+        """
+        Args:
+            issues_values (Dict[str, list]): ordered values of every issue, in issue order
+        """
+        self.issues = list(issues_values.keys())
+        self.values = [list(values) for values in issues_values.values()]
+        self.value_indices = [{v: i for i, v in enumerate(values)} for values in self.values]
+
+        self.radices = np.array([len(values) for values in self.values], dtype=np.int64)
+        self.size = prod(len(values) for values in self.values)
+        if self.size > MAX_DOMAIN_SIZE:
+            raise ValueError(f"Domain of {self.size} bids is too large to encode as int64")
+
+        # weight of the value index of every issue in the code
+        strides = [1] * len(self.values)
+        for i in reversed(range(len(self.values) - 1)):
+            strides[i] = strides[i + 1] * len(self.values[i + 1])
+        self.strides = np.array(strides, dtype=np.int64)
+
+        # smallest integer type that fits the value indices
+        self.index_dtype = np.min_scalar_type(max([len(v) for v in self.values] + [1]) - 1)
+
+    @classmethod
+    def from_domain(cls, domain) -> "BidCodec":
+        """Create the codec of a geniusweb Domain. Issues are sorted by name, as the issues of
+        a geniusweb Domain have no fixed order.
+        """
+        return cls(
+            {issue: domain.getValues(issue).getValues() for issue in sorted(domain.getIssues())}
+        )
+
+    def encode(self, bid) -> int:
+        """Encode a single bid (dictionary or geniusweb Bid) to its code."""
+        return sum(
+            index * stride
+            for index, stride in zip(self.get_bid_value_indices(bid), self.strides.tolist())
+        )
+
+    def decode(self, code: int) -> dict:
+        """Decode a single code to a bid dictionary of issues to values."""
+        if not 0 <= code < self.size:
+            raise ValueError(f"Code {code} is out of range for a domain of {self.size} bids")
+        bid = {}
+        for issue, values, stride in zip(self.issues, self.values, self.strides.tolist()):
+            index, code = divmod(code, stride)
+            bid[issue] = values[index]
+        return bid
+
+    def encode_many(self, bids: list) -> np.ndarray:
+        """Encode a sequence of bids (dictionaries or geniusweb Bids) to an int64 array of codes."""
+        value_indices = np.array(
+            [self.get_bid_value_indices(bid) for bid in bids], dtype=np.int64
+        ).reshape(len(bids), len(self.issues))
+        return self.encode_indices(value_indices)
+
+    def decode_many(self, codes: np.ndarray) -> List[dict]:
+        """Decode an array of codes to bid dictionaries."""
+        value_indices = self.decode_indices(codes).tolist()
+        return [
+            {issue: values[i] for issue, values, i in zip(self.issues, self.values, indices)}
+            for indices in value_indices
+        ]
+
+    def encode_indices(self, value_indices: np.ndarray) -> np.ndarray:
+        """Encode a matrix of value indices (bids x issues) to an int64 array of codes."""
+        return np.asarray(value_indices, dtype=np.int64) @ self.strides
+
+    def decode_indices(self, codes: np.ndarray) -> np.ndarray:
+        """Decode an array of codes to a matrix of value indices (bids x issues)."""
+        codes = np.asarray(codes, dtype=np.int64)
+        if codes.size and (codes.min() < 0 or codes.max() >= self.size):
+            raise ValueError(f"Codes are out of range for a domain of {self.size} bids")
+        value_indices = codes[:, None] // self.strides % self.radices
+        return value_indices.astype(self.index_dtype)
+
+    def get_bid_value_indices(self, bid) -> List[int]:
+        """Indices of the values of a bid (dictionary or geniusweb Bid), in issue order."""
+        if hasattr(bid, "getIssueValues"):
+            bid = bid.getIssueValues()
+        try:
+            return [
+                value_index[bid[issue]]
+                for issue, value_index in zip(self.issues, self.value_indices)
+            ]
+        except KeyError as e:
+            raise ValueError(f"Bid {bid} is not a complete bid of the domain") from e
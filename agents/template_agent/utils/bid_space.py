@@ -0,0 +1,62 @@
+from typing import Iterator, Tuple
+
+import numpy as np
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.issuevalue.Domain import Domain
+
+from .bid_codec import BidCodec
+
+
+class BidSpace:
+    """View on all bids of a discrete domain, built once per domain. It can be used in place
+    of AllBidsList (`size`, `get` and iteration), but bids are only created when asked for.
+    Bids are identified by an index, which is their code (see `BidCodec`), so many bids can be
+    sampled at once and inspected through their value indices or values, only creating a Bid
+    object for the bid that is finally chosen.
+
+    Note that the order of the bids differs from AllBidsList.
+    """
+
+    def __init__(self, domain: Domain):
+        self.domain = domain
+        self.codec = BidCodec.from_domain(domain)
+
+    def size(self) -> int:
+        return self.codec.size
+
+    def __len__(self) -> int:
+        return self.codec.size
+
+    def get(self, index: int) -> Bid:
+        """Create the bid at an index."""
+        return Bid(self.codec.decode(int(index)))
+
+    def get_values(self, index: int) -> Tuple:
+        """Values of the bid at an index in the order of `codec.issues`, without creating a Bid."""
+        return tuple(self.codec.decode(int(index)).values())
+
+    def get_value_indices(self, indices: np.ndarray) -> np.ndarray:
+        """Value indices (bids x issues) of the bids at a sequence of indices."""
+        return self.codec.decode_indices(indices)
+
+    def sample(self, num_bids: int, rng: np.random.Generator = None) -> np.ndarray:
+        """Draw the indices of bids uniformly at random (with replacement).
+
+        Args:
+            num_bids (int): number of bids to draw
+            rng (np.random.Generator, optional): random generator. Defaults to None (global numpy random state).
+
+        Returns:
+            np.ndarray: indices of the bids
+        """
+        if rng is None:
+            return np.random.randint(0, self.codec.size, size=num_bids, dtype=np.int64)
+        return rng.integers(0, self.codec.size, size=num_bids, dtype=np.int64)
+
+    def index_of(self, bid: Bid) -> int:
+        """Index of a (complete) bid."""
+        return self.codec.encode(bid)
+
+    def __iter__(self) -> Iterator[Bid]:
+        for index in range(self.codec.size):
+            yield self.get(index)
@@ -1,121 +1,147 @@
-from collections import defaultdict
+from typing import List
 
+import numpy as np
 from geniusweb.issuevalue.Bid import Bid
 from geniusweb.issuevalue.DiscreteValueSet import DiscreteValueSet
 from geniusweb.issuevalue.Domain import Domain
-from geniusweb.issuevalue.Value import Value
+
+from .bid_codec import BidCodec
 
 
 class OpponentModel:
+    """Frequency based opponent model. For every issue, the number of times that each value
+    was offered by the opponent is counted in an array. The predicted issue weight is high if
+    the opponent keeps offering the same value, the predicted utility of a value increases with
+    its count. Predictions for many bids at once are made with `predict_many`.
+    """
+
     def __init__(self, domain: Domain):
         self.offers = []
         self.domain = domain
+        self.codec = BidCodec.from_domain(domain)
+
+        for value_set in domain.getIssuesValues().values():
+            if not isinstance(value_set, DiscreteValueSet):
+                raise TypeError(
+                    "This opponent model only supports issues with discrete values"
+                )
+
+        # issues in the order of the domain, with the matching column of the codec
+        self.issues = list(domain.getIssuesValues().keys())
+        self.columns = [self.codec.issues.index(issue) for issue in self.issues]
+        self.num_values = [len(self.codec.values[column]) for column in self.columns]
 
-        self.issue_estimators = {
-            i: IssueEstimator(v) for i, v in domain.getIssuesValues().items()
-        }
+        # value counts per issue, the last entry counts values that are missing from a bid
+        self.value_counts = [np.zeros(n + 1, dtype=np.int64) for n in self.num_values]
+        self.max_value_counts = [0 for _ in self.issues]
+        self.issue_weights = [0.0 for _ in self.issues]
+
+        # predicted value utilities per issue, recalculated on first use after an update
+        self._value_utilities: List[List[float]] = None
+        self._value_utility_arrays: List[np.ndarray] = None
 
     def update(self, bid: Bid):
         # keep track of all bids received
         self.offers.append(bid)
+        bids_received = len(self.offers)
+
+        for i, issue in enumerate(self.issues):
+            # register that the value was offered and update the count of the most common value
+            value_index = self.get_value_index(i, bid.getValue(issue))
+            self.value_counts[i][value_index] += 1
+            self.max_value_counts[i] = max(
+                int(self.value_counts[i][value_index]), self.max_value_counts[i]
+            )
 
-        # update all issue estimators with the value that is offered for that issue
-        for issue_id, issue_estimator in self.issue_estimators.items():
-            issue_estimator.update(bid.getValue(issue_id))
+            # update predicted issue weight
+            # the intuition here is that if the values of the receiverd offers spread out over all
+            # possible values, then this issue is likely not important to the opponent (weight == 0.0).
+            # If all received offers proposed the same value for this issue,
+            # then the predicted issue weight == 1.0
+            equal_shares = bids_received / self.num_values[i]
+            self.issue_weights[i] = (self.max_value_counts[i] - equal_shares) / (
+                bids_received - equal_shares
+            )
+
+        self._value_utilities = None
 
     def get_predicted_utility(self, bid: Bid):
         if len(self.offers) == 0 or bid is None:
             return 0
 
-        # initiate
-        total_issue_weight = 0.0
-        value_utilities = []
-        issue_weights = []
-
-        for issue_id, issue_estimator in self.issue_estimators.items():
-            # get the value that is set for this issue in the bid
-            value: Value = bid.getValue(issue_id)
-
-            # collect both the predicted weight for the issue and
-            # predicted utility of the value within this issue
-            value_utilities.append(issue_estimator.get_value_utility(value))
-            issue_weights.append(issue_estimator.weight)
-
-            total_issue_weight += issue_estimator.weight
-
-        # normalise the issue weights such that the sum is 1.0
-        if total_issue_weight == 0.0:
-            issue_weights = [1 / len(issue_weights) for _ in issue_weights]
-        else:
-            issue_weights = [iw / total_issue_weight for iw in issue_weights]
+        value_utilities = self.get_value_utilities()
+        issue_weights = self.get_normalised_issue_weights()
 
         # calculate predicted utility by multiplying all value utilities with their issue weight
         predicted_utility = sum(
-            [iw * vu for iw, vu in zip(issue_weights, value_utilities)]
+            [
+                iw * value_utilities[i][self.get_value_index(i, bid.getValue(issue))]
+                for i, (issue, iw) in enumerate(zip(self.issues, issue_weights))
+            ]
         )
 
         return predicted_utility
 
+    def predict_many(self, bid_indices: np.ndarray) -> np.ndarray:
+        """Predicted utilities of many bids at once, equal to those of `get_predicted_utility`.
 
-class IssueEstimator:
-    def __init__(self, value_set: DiscreteValueSet):
-        if not isinstance(value_set, DiscreteValueSet):
-            raise TypeError(
-                "This issue estimator only supports issues with discrete values"
-            )
-
-        self.bids_received = 0
-        self.max_value_count = 0
-        self.num_values = value_set.size()
-        self.value_trackers = defaultdict(ValueEstimator)
-        self.weight = 0
-
-    def update(self, value: Value):
-        self.bids_received += 1
+        Args:
+            bid_indices (np.ndarray): indices of the bids, i.e. their codes (see `BidCodec` and `BidSpace`)
 
-        # get the value tracker of the value that is offered
-        value_tracker = self.value_trackers[value]
+        Returns:
+            np.ndarray: predicted utilities of the bids
+        """
+        predicted_utilities = np.zeros(len(bid_indices), dtype=np.float64)
+        if len(self.offers) == 0:
+            return predicted_utilities
 
-        # register that this value was offered
-        value_tracker.update()
-
-        # update the count of the most common offered value
-        self.max_value_count = max([value_tracker.count, self.max_value_count])
-
-        # update predicted issue weight
-        # the intuition here is that if the values of the receiverd offers spread out over all
-        # possible values, then this issue is likely not important to the opponent (weight == 0.0).
-        # If all received offers proposed the same value for this issue,
-        # then the predicted issue weight == 1.0
-        equal_shares = self.bids_received / self.num_values
-        self.weight = (self.max_value_count - equal_shares) / (
-            self.bids_received - equal_shares
-        )
+        value_indices = self.codec.decode_indices(bid_indices)
+        self.get_value_utilities()
+        issue_weights = self.get_normalised_issue_weights()
 
-        # recalculate all value utilities
-        for value_tracker in self.value_trackers.values():
-            value_tracker.recalculate_utility(self.max_value_count, self.weight)
+        # summed issue by issue, in the same order as get_predicted_utility
+        for i, (column, iw) in enumerate(zip(self.columns, issue_weights)):
+            predicted_utilities += iw * self._value_utility_arrays[i][value_indices[:, column]]
 
-    def get_value_utility(self, value: Value):
-        if value in self.value_trackers:
-            return self.value_trackers[value].utility
+        return predicted_utilities
 
-        return 0
-
-
-class ValueEstimator:
-    def __init__(self):
-        self.count = 0
-        self.utility = 0
-
-    def update(self):
-        self.count += 1
-
-    def recalculate_utility(self, max_value_count: int, weight: float):
-        if weight < 1:
-            mod_value_count = ((self.count + 1) ** (1 - weight)) - 1
-            mod_max_value_count = ((max_value_count + 1) ** (1 - weight)) - 1
+    def get_normalised_issue_weights(self) -> List[float]:
+        """Predicted issue weights, normalised such that their sum is 1.0."""
+        total_issue_weight = 0.0
+        for iw in self.issue_weights:
+            total_issue_weight += iw
 
-            self.utility = mod_value_count / mod_max_value_count
-        else:
-            self.utility = 1
+        if total_issue_weight == 0.0:
+            return [1 / len(self.issue_weights) for _ in self.issue_weights]
+        return [iw / total_issue_weight for iw in self.issue_weights]
+
+    def get_value_utilities(self) -> List[List[float]]:
+        """Predicted utility of every value (and of a missing value) per issue. Values that
+        were never offered have utility 0.
+        """
+        if self._value_utilities is None:
+            self._value_utilities = []
+            for counts, max_value_count, weight in zip(
+                self.value_counts, self.max_value_counts, self.issue_weights
+            ):
+                if weight < 1:
+                    mod_max_value_count = ((max_value_count + 1) ** (1 - weight)) - 1
+                    utilities = [
+                        ((count + 1) ** (1 - weight) - 1) / mod_max_value_count if count else 0
+                        for count in counts.tolist()
+                    ]
+                else:
+                    utilities = [1 if count else 0 for count in counts.tolist()]
+                self._value_utilities.append(utilities)
+            self._value_utility_arrays = [
+                np.array(utilities, dtype=np.float64) for utilities in self._value_utilities
+            ]
+
+        return self._value_utilities
+
+    def get_value_index(self, issue_index: int, value) -> int:
+        """Index of a value in the counts of an issue, values that are not part of the domain
+        (e.g. missing from a partial bid) share the last index.
+        """
+        column = self.columns[issue_index]
+        return self.codec.value_indices[column].get(value, self.num_values[issue_index])
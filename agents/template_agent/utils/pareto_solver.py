@@ -0,0 +1,105 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+def get_pareto_indices(utilities_A: np.ndarray, utilities_B: np.ndarray) -> np.ndarray:
+    """Indices of the points on the Pareto frontier, sorted on ascending utility A. Points that
+    are dominated by another point are removed, of points with equal utilities the first is kept.
+
+    Args:
+        utilities_A (np.ndarray): utilities of the points for the first party
+        utilities_B (np.ndarray): utilities of the points for the second party
+
+    Returns:
+        np.ndarray: indices of the points on the Pareto frontier
+    """
+    # sort on descending utility A, then descending utility B (stable, so earlier points
+    # go first). A point is on the frontier if its utility B exceeds that of all points before it.
+    order = np.lexsort((-utilities_B, -utilities_A))
+    sorted_utilities_B = utilities_B[order]
+    pareto_mask = np.empty(len(order), dtype=bool)
+    pareto_mask[:1] = True
+    pareto_mask[1:] = sorted_utilities_B[1:] > np.maximum.accumulate(sorted_utilities_B)[:-1]
+    return order[pareto_mask][::-1]
+
+
+def solve_pareto_front(
+    weighted_utilities_A: List[np.ndarray], weighted_utilities_B: List[np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Calculate the Pareto frontier of a domain with linear additive utility functions,
+    without enumerating all bids. The utility of a bid is the sum of the weighted utilities
+    of its values, so the frontier of all bids is contained in the combinations of the
+    frontiers of partial bids. The issues are merged one by one, keeping only the Pareto
+    frontier of the partial bids after every issue.
+
+    Utilities are summed issue by issue, so they are equal to those of a full enumeration
+    that sums in the same order, as is the frontier. When multiple bids have exactly the same
+    utilities, a different (but equivalent) bid may be returned than by a full enumeration.
+
+    Args:
+        weighted_utilities_A (List[np.ndarray]): weighted utilities (issue weight * value utility)
+            of the values of every issue for the first party
+        weighted_utilities_B (List[np.ndarray]): same for the second party
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: value indices of the bids on the frontier
+            (bids x issues), and their utilities for both parties, sorted on ascending utility A
+    """
+    # start from the empty partial bid
+    value_indices = np.zeros((1, 0), dtype=np.int64)
+    utilities_A = np.zeros(1, dtype=np.float64)
+    utilities_B = np.zeros(1, dtype=np.float64)
+
+    for issue_utilities_A, issue_utilities_B in zip(weighted_utilities_A, weighted_utilities_B):
+        issue_utilities_A = np.asarray(issue_utilities_A, dtype=np.float64)
+        issue_utilities_B = np.asarray(issue_utilities_B, dtype=np.float64)
+
+        # values that are dominated within the issue can not be part of a bid on the frontier
+        values = np.sort(get_pareto_indices(issue_utilities_A, issue_utilities_B))
+
+        # combine every partial bid with every remaining value, in the order of the bid codes
+        num_partial, num_values = len(value_indices), len(values)
+        value_indices = np.hstack(
+            [
+                np.repeat(value_indices, num_values, axis=0),
+                np.tile(values, num_partial)[:, None],
+            ]
+        )
+        utilities_A = (utilities_A[:, None] + issue_utilities_A[values][None, :]).ravel()
+        utilities_B = (utilities_B[:, None] + issue_utilities_B[values][None, :]).ravel()
+
+        # keep the frontier of the partial bids
+        pareto_indices = np.sort(get_pareto_indices(utilities_A, utilities_B))
+        value_indices = value_indices[pareto_indices]
+        utilities_A = utilities_A[pareto_indices]
+        utilities_B = utilities_B[pareto_indices]
+
+    order = np.argsort(utilities_A, kind="stable")
+    return value_indices[order], utilities_A[order], utilities_B[order]
+
+
+def get_special_indices(utilities_A: np.ndarray, utilities_B: np.ndarray) -> dict:
+    """Find the social welfare, Nash and Kalai-Smorodinsky bids on a Pareto frontier. On ties,
+    the first bid is chosen.
+
+    Args:
+        utilities_A (np.ndarray): utilities of the bids on the frontier for the first party
+        utilities_B (np.ndarray): utilities of the bids on the frontier for the second party
+
+    Returns:
+        dict: index of the "social_welfare", "nash" and "kalai" bid in the frontier, None if
+            no bid has a positive social welfare or Nash product
+    """
+    utility_sum = utilities_A + utilities_B
+    utility_prod = utilities_A * utilities_B
+    utility_diff = np.abs(utilities_A - utilities_B)
+
+    social_welfare = int(np.argmax(utility_sum))
+    nash = int(np.argmax(utility_prod))
+    return {
+        "social_welfare": social_welfare if utility_sum[social_welfare] > 0 else None,
+        "nash": nash if utility_prod[nash] > 0 else None,
+        "kalai": int(np.argmin(utility_diff)),
+    }
+
@@ -0,0 +1,135 @@
+import os
+from decimal import Decimal
+from typing import List, Tuple
+
+import numpy as np
+
+from .bid_codec import BidCodec
+
+# the bid codes and utilities are stored next to the profile, e.g. profileA.sorted_bids.npy
+SORTED_BIDS_FILE = "{}.sorted_bids.npy"
+SORTED_UTILITIES_FILE = "{}.sorted_utilities.npy"
+# exact utilities are summed in limbs of 15 decimal digits, which fit in an int64 sum
+LIMB = 10**15
+
+
+class SortedBids:
+    """All bids of a profile sorted on descending utility (ties in order of the bid codes).
+    Agents typically build this at Settings time by sorting AllBidsList on `getUtility`, which
+    takes seconds for large domains. Instead, the sorted bids are memory-mapped from the
+    artifacts that `create_domains` writes next to the profile. If they are missing or older
+    than the profile, they are computed. The order is exact, the float utilities can differ
+    from the Decimal utilities in the last digits.
+
+    Bids are identified by their code (see `BidCodec.from_domain`), use `get_bid` to obtain
+    a geniusweb Bid.
+    """
+
+    def __init__(self, profile, profile_uri: str):
+        """
+        Args:
+            profile (LinearAdditiveUtilitySpace): utility function of the agent
+            profile_uri (str): URI of the profile, e.g. settings.getProfile().getURI()
+        """
+        self.codec = BidCodec.from_domain(profile.getDomain())
+        profile_path = str(profile_uri).split(":", 1)[-1]
+
+        sorted_bids = load_sorted_bids(profile_path, self.codec.size)
+        if sorted_bids is None:
+            weighted_utilities = [
+                [
+                    profile.getWeight(issue) * profile.getUtilities()[issue].getUtility(value)
+                    for value in values
+                ]
+                for issue, values in zip(self.codec.issues, self.codec.values)
+            ]
+            sorted_bids = sort_bids(weighted_utilities, self.codec)
+        self.codes, self.utilities = sorted_bids
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def get_bid(self, index: int):
+        """The bid at a position in the sorted order (0 is the best bid) as a geniusweb Bid."""
+        # imported here, so that tooling can use this module without geniusweb
+        from geniusweb.issuevalue.Bid import Bid
+
+        return Bid(self.codec.decode(int(self.codes[index])))
+
+    def get_utility(self, index: int) -> float:
+        return float(self.utilities[index])
+
+
+def sort_bids(
+    weighted_utilities: List[List[Decimal]], codec: BidCodec
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Sort all bids of a domain on descending utility, with exact Decimal arithmetic.
+
+    Args:
+        weighted_utilities (List[List[Decimal]]): issue weight * value utility of every value,
+            in the issue and value order of the codec
+        codec (BidCodec): codec of the domain
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: bid codes (int64) and utilities (float64) in sorted order
+    """
+    # scale all weighted utilities to integers and split them into limbs
+    scale = max([-min(d.as_tuple().exponent, 0) for u in weighted_utilities for d in u] + [0])
+    int_utilities = [[int(d.scaleb(scale)) for d in u] for u in weighted_utilities]
+    if any(i < 0 for u in int_utilities for i in u):
+        raise ValueError("Bids can only be sorted for non-negative utilities")
+    max_int = max([i for u in int_utilities for i in u] + [1])
+    num_limbs = 1
+    while LIMB**num_limbs <= max_int:
+        num_limbs += 1
+
+    value_indices = codec.decode_indices(np.arange(codec.size, dtype=np.int64))
+    limb_sums = np.zeros((num_limbs, codec.size), dtype=np.int64)
+    for i, utilities in enumerate(int_utilities):
+        limbs = np.array(
+            [[(u // LIMB**limb) % LIMB for u in utilities] for limb in range(num_limbs)],
+            dtype=np.int64,
+        )
+        limb_sums += limbs[:, value_indices[:, i]]
+    for limb in range(num_limbs - 1):
+        limb_sums[limb + 1] += limb_sums[limb] // LIMB
+        limb_sums[limb] %= LIMB
+
+    # lexsort uses the last key as primary key, the codes break ties
+    codes = np.lexsort([np.arange(codec.size)] + [-limb_sum for limb_sum in limb_sums])
+    utilities = sum(
+        limb_sums[limb][codes].astype(np.float64) * (float(LIMB) ** limb / 10**scale)
+        for limb in range(num_limbs)
+    )
+    return codes.astype(np.int64), np.asarray(utilities, dtype=np.float64)
+
+
+def get_sorted_bids_paths(profile_path: str) -> Tuple[str, str]:
+    """Paths of the sorted bid codes and utilities of a profile."""
+    root = os.path.splitext(profile_path)[0]
+    return SORTED_BIDS_FILE.format(root), SORTED_UTILITIES_FILE.format(root)
+
+
+def save_sorted_bids(profile_path: str, codes: np.ndarray, utilities: np.ndarray):
+    """Store the sorted bids of a profile next to the profile (see `SortedBids`)."""
+    codes_path, utilities_path = get_sorted_bids_paths(profile_path)
+    np.save(codes_path, codes.astype(np.int64))
+    np.save(utilities_path, utilities.astype(np.float64))
+
+
+def load_sorted_bids(profile_path: str, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Memory-map the sorted bids of a profile, None if they are missing, older than the
+    profile or do not match the size of the domain.
+    """
+    codes_path, utilities_path = get_sorted_bids_paths(profile_path)
+    try:
+        profile_mtime = os.stat(profile_path).st_mtime_ns
+        if min(os.stat(p).st_mtime_ns for p in (codes_path, utilities_path)) < profile_mtime:
+            return None
+        codes = np.load(codes_path, mmap_mode="r")
+        utilities = np.load(utilities_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if len(codes) != size or len(utilities) != size:
+        return None
+    return codes, utilities
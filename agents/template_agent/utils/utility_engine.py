@@ -0,0 +1,75 @@
+from typing import List
+
+import numpy as np
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import (
+    LinearAdditiveUtilitySpace,
+)
+
+from .bid_codec import BidCodec
+
+
+class UtilityEngine:
+    """Compiled version of a LinearAdditiveUtilitySpace to evaluate many bids at once.
+    `profile.getUtility(bid)` walks all issues with Decimal arithmetic for every bid. The
+    engine converts the weighted utilities (issue weight * value utility) to float64 lookup
+    arrays once, such that the utilities of bids encoded as value indices (see `BidCodec`) are
+    obtained with a single vectorised operation. Results equal `float(profile.getUtility(bid))`
+    up to float rounding.
+    """
+
+    def __init__(self, profile: LinearAdditiveUtilitySpace, codec: BidCodec = None):
+        """
+        Args:
+            profile (LinearAdditiveUtilitySpace): utility function to compile
+            codec (BidCodec, optional): codec of the domain. Defaults to None (codec of the profile domain).
+        """
+        self.profile = profile
+        self.codec = codec if codec is not None else BidCodec.from_domain(profile.getDomain())
+
+        # weighted utility per value for single bids
+        self.value_utilities = []
+        for issue, values in zip(self.codec.issues, self.codec.values):
+            weight = profile.getWeight(issue)
+            value_set_utilities = profile.getUtilities()[issue]
+            self.value_utilities.append(
+                {v: float(weight * value_set_utilities.getUtility(v)) for v in values}
+            )
+
+        # the weighted utilities of all issues in a single array, the utilities of the values
+        # of an issue start at the offset of that issue
+        num_values = [len(values) for values in self.codec.values]
+        self.offsets = np.cumsum([0] + num_values[:-1]).astype(np.int64)
+        self.utilities = np.array(
+            [u for value_utilities in self.value_utilities for u in value_utilities.values()],
+            dtype=np.float64,
+        )
+
+    def get_utility(self, bid: Bid) -> float:
+        """Utility of a single bid. Values that are missing from the bid have utility 0."""
+        if bid is None:
+            return 0.0
+        return sum(
+            value_utilities.get(bid.getValue(issue), 0.0)
+            for issue, value_utilities in zip(self.codec.issues, self.value_utilities)
+        )
+
+    def get_utilities(self, value_indices: np.ndarray) -> np.ndarray:
+        """Utilities of bids encoded as value indices.
+
+        Args:
+            value_indices (np.ndarray): value indices of the bids (bids x issues)
+
+        Returns:
+            np.ndarray: utilities of the bids
+        """
+        return self.utilities[self.offsets + np.asarray(value_indices, dtype=np.int64)].sum(axis=1)
+
+    def get_utilities_of_codes(self, codes: np.ndarray) -> np.ndarray:
+        """Utilities of bids encoded as codes (see `BidCodec`)."""
+        return self.get_utilities(self.codec.decode_indices(codes))
+
+    def get_utilities_of_bids(self, bids: List[Bid]) -> np.ndarray:
+        """Utilities of a sequence of complete bids."""
+        value_indices = [self.codec.get_bid_value_indices(bid) for bid in bids]
+        return self.get_utilities(np.array(value_indices, dtype=np.int64).reshape(len(bids), -1))
@@ -1,38 +1,82 @@
-from geniusweb.bidspace.BidsWithUtility import BidsWithUtility
-from geniusweb.bidspace.Interval import Interval
-from geniusweb.bidspace.IssueInfo import IssueInfo
 from geniusweb.issuevalue.Bid import Bid
-from geniusweb.issuevalue.Value import Value
 from geniusweb.profile.utilityspace.LinearAdditive import LinearAdditive
+from tudelft.utilities.immutablelist.AbstractImmutableList import AbstractImmutableList
 from tudelft.utilities.immutablelist.ImmutableList import ImmutableList
-from decimal import Decimal
+from decimal import ROUND_CEILING, ROUND_FLOOR, Decimal
 from typing import List
 
+import numpy as np
+
+from agents.template_agent.utils.bid_codec import BidCodec
+
 
 class ExtendedUtilSpace:
     """
     Inner class for TimeDependentParty, made public for testing purposes. This
     class may change in the future, use at your own risk.
+    <p>
+    Instead of BidsWithUtility, all bids are indexed once on their utility.
+    Utilities are the sums of the weighted issue utilities rounded to
+    {@link #precision} decimals, like BidsWithUtility, so they are stored as
+    exact integers. Finding the bids in a utility interval is then a binary
+    search in the sorted utilities, and the bids are only created when they
+    are taken from the returned list.
     """
 
-    def __init__(self, space: LinearAdditive):
+    def __init__(self, space: LinearAdditive, precision: int = 4):
         self._utilspace = space
-        self._bidutils = BidsWithUtility.create(self._utilspace)
+        self._precision = precision
+        self._codec = BidCodec.from_domain(space.getDomain())
+        self._computeWeightedUtils()
+        self._computeIndex()
         self._computeMinMax()
         self._tolerance = self._computeTolerance()
 
+    def _computeWeightedUtils(self):
+        """
+        Computes the weighted utility (issue weight * value utility) of every
+        value, rounded to the precision, in the issue and value order of the
+        codec.
+        """
+        self._weightedUtils: List[List[Decimal]] = []
+        for issue, values in zip(self._codec.issues, self._codec.values):
+            weight = self._utilspace.getWeight(issue)
+            utils = self._utilspace.getUtilities()[issue]
+            self._weightedUtils.append(
+                [round(weight * utils.getUtility(val), self._precision) for val in values]
+            )
+
+    def _computeIndex(self):
+        """
+        Computes the utilities of all bids as integers (utility *
+        10^precision) and sorts the bids on them.
+        <p>
+        As the last issue of the codec changes fastest, the utilities of an
+        issue are repeated for every combination of the issues after it, and
+        this pattern is tiled for every combination of the issues before it.
+        """
+        utils = np.zeros(self._codec.size, dtype=np.int64)
+        for weightedUtils, radix, stride in zip(
+            self._weightedUtils, self._codec.radices.tolist(), self._codec.strides.tolist()
+        ):
+            intUtils = np.array(
+                [int(u.scaleb(self._precision)) for u in weightedUtils], dtype=np.int64
+            )
+            utils += np.tile(
+                np.repeat(intUtils, stride), self._codec.size // (radix * stride)
+            )
+
+        self._codes = np.argsort(utils, kind="stable")
+        self._utils = utils[self._codes]
+
     def _computeMinMax(self):
         """
         Computes the fields minutil and maxUtil.
         <p>
-        TODO this is simplistic, very expensive method and may cause us to run
-        out of time on large domains.
-        <p>
-        Assumes that utilspace and bidutils have been set properly.
+        Assumes that utilspace and the index have been set properly.
         """
-        range = self._bidutils.getRange()
-        self._minUtil = range.getMin()
-        self._maxUtil = range.getMax()
+        self._minUtil = self._toDecimal(self._utils[0])
+        self._maxUtil = self._toDecimal(self._utils[-1])
 
         rvbid = self._utilspace.getReservationBid()
         if rvbid != None:
@@ -51,17 +95,16 @@ class ExtendedUtilSpace:
                 value.
         """
         tolerance = Decimal(1)
-        for iss in self._bidutils.getInfo():
-            if iss.getValues().size() > 1:
+        for weightedUtils in self._weightedUtils:
+            if len(weightedUtils) > 1:
                 # we have at least 2 values.
-                values: List[Decimal] = []
-                for val in iss.getValues():
-                    values.append(iss.getWeightedUtil(val))
-                values.sort()
-                values.reverse()
+                values: List[Decimal] = sorted(weightedUtils, reverse=True)
                 tolerance = min(tolerance, values[0] - values[1])
         return tolerance
 
+    def _toDecimal(self, util: int) -> Decimal:
+        return Decimal(int(util)).scaleb(-self._precision)
+
     def getMin(self) -> Decimal:
         return self._minUtil
 
@@ -74,6 +117,30 @@ class ExtendedUtilSpace:
         @return bids with utility inside [utilitygoal-{@link #tolerance},
                 utilitygoal]
         """
-        return self._bidutils.getBids(
-            Interval(utilityGoal - self._tolerance, utilityGoal)
+        # the interval is rounded inwards to the precision, like BidsWithUtility
+        minUtil = (utilityGoal - self._tolerance).scaleb(self._precision)
+        maxUtil = utilityGoal.scaleb(self._precision)
+        start = np.searchsorted(
+            self._utils, int(minUtil.to_integral_value(ROUND_CEILING)), side="left"
+        )
+        end = np.searchsorted(
+            self._utils, int(maxUtil.to_integral_value(ROUND_FLOOR)), side="right"
         )
+        return IndexedBids(self._codec, self._codes[start:end])
+
+
+class IndexedBids(AbstractImmutableList):
+    """
+    List of the bids with the given codes, a bid is only created when it is
+    requested.
+    """
+
+    def __init__(self, codec: BidCodec, codes: np.ndarray):
+        self._codec = codec
+        self._codes = codes
+
+    def get(self, index: int) -> Bid:
+        return Bid(self._codec.decode(int(self._codes[index])))
+
+    def size(self) -> int:
+        return len(self._codes)
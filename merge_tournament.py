@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+from utils.runners import merge_tournament_shards
+
+# Merge the results of the shards of a tournament that share a results directory (see run_tournament.py).
+# Usage: python merge_tournament.py <results directory>
+if len(sys.argv) != 2:
+    print("Usage: python merge_tournament.py <results directory>")
+    exit(1)
+
+RESULTS_DIR = Path(sys.argv[1])
+
+# combine the journals of all shards and save the summary to tournament_results_summary.csv
+tournament_results_summary = merge_tournament_shards(RESULTS_DIR)
+print(tournament_results_summary)
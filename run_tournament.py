@@ -3,18 +3,30 @@ import os
 from pathlib import Path
 import time
 
+from utils.result_sink import shard_suffix
 from utils.runners import run_tournament
 
 RESULTS_DIR = Path("results", time.strftime('%Y%m%d-%H%M%S'))
 
-# create results directory if it does not exist
-if not RESULTS_DIR.exists():
-    RESULTS_DIR.mkdir(parents=True)
-
 # Settings to run a negotiation session:
 #   You need to specify the classpath of 2 agents to start a negotiation. Parameters for the agent can be added as a dict (see example)
 #   You need to specify the preference profiles for both agents. The first profile will be assigned to the first agent.
 #   You need to specify a time deadline (is milliseconds (ms)) we are allowed to negotiate before we end without agreement.
+#   Optionally, sessions can be run in parallel worker processes. The number of workers defaults to the number of cores.
+#   Finished sessions are journaled in the results directory. To resume an interrupted tournament, set RESULTS_DIR
+#   to the results directory of that tournament and set "resume" to True. Set "save_traces" to also save the full
+#   trace of every session.
+#   Optionally, only a shard (slice) of the sessions can be run, e.g. as part of an array job on a cluster. Set "shard"
+#   to [shard index, number of shards] and use the same (not timestamped) RESULTS_DIR for every shard. Combine the
+#   results of the shards afterwards with merge_tournament.py.
+#   Optionally, every session can run in a separate process with a hard time limit in seconds ("session_timeout_s",
+#   above the deadline). Sessions that exceed it are killed and recorded as ERROR, so that a hanging agent can not
+#   stall the tournament.
+#   Optionally, sessions can run on a virtual clock that only advances with the compute time of the agents and a fixed
+#   cost per turn, instead of wall-clock time. Set "compute_factor" to 0.0 and a "seed" for reproducible sessions.
+#   Set "engine" to "direct" to run sessions with the lightweight in-process engine instead of geniusweb's runner.
+#   The compute time, time per turn, number of turns and memory growth of every agent are added to the results. Set
+#   "trace_allocations" to also trace the peak Python allocations of the agents (this slows down the agents).
 tournament_settings = {
     "agents": [
         {
@@ -119,17 +131,35 @@ tournament_settings = {
         ["domains/domain00/profileA.json", "domains/domain00/profileB.json"],
         ["domains/domain01/profileA.json", "domains/domain01/profileB.json"],
     ],
+    # profile sets can also be selected from the domain catalog, e.g. domains with a high opposition and many bids
+    # (after "from utils.domain_catalog import select_profile_sets"):
+    # "profile_sets": select_profile_sets(opposition=(0.5, None), size=(5000, None)),
     "deadline_time_ms": 10000,
+    "parallel": False,
+    # "num_workers": 4,
+    "resume": False,
+    "save_traces": False,
+    # "shard": [0, 4],
+    # "session_timeout_s": 30,
+    # "engine": "direct",
+    # "virtual_time": {"turn_cost_ms": 10.0, "compute_factor": 1.0},
+    # "seed": 0,
+    # "trace_allocations": True,
 }
 
-# run a session and obtain results in dictionaries
-tournament_steps, tournament_results, tournament_results_summary = run_tournament(tournament_settings)
+# supervised sessions start new processes that import this script, so the tournament only runs as main script
+if __name__ == "__main__":
+    # create results directory if it does not exist, shards may share it and create it at the same time
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+
+    # run a session and obtain results in dictionaries
+    # the settings, summary and (optionally) trace of every session are streamed to JSON Lines files in the results
+    # directory as soon as the session ends. Use utils.result_sink.load_tournament_results to load them again.
+    tournament_steps, tournament_results, tournament_results_summary = run_tournament(tournament_settings, RESULTS_DIR)
 
-# save the tournament settings for reference
-with open(RESULTS_DIR.joinpath("tournament_steps.json"), "w", encoding="utf-8") as f:
-    f.write(json.dumps(tournament_steps, indent=2))
-# save the tournament results
-with open(RESULTS_DIR.joinpath("tournament_results.json"), "w", encoding="utf-8") as f:
-    f.write(json.dumps(tournament_results, indent=2))
-# save the tournament results summary
-tournament_results_summary.to_csv(RESULTS_DIR.joinpath("tournament_results_summary.csv"))
+    # save the tournament results summary, shards save a partial summary
+    suffix = shard_suffix(tournament_settings.get("shard"))
+    tournament_results_summary.to_csv(RESULTS_DIR.joinpath(f"tournament_results_summary{suffix}.csv"))
+    # save tournament level statistics (e.g. timing)
+    with open(RESULTS_DIR.joinpath(f"tournament_stats{suffix}.json"), "w", encoding="utf-8") as f:
+        f.write(json.dumps(tournament_results_summary.attrs, indent=2))
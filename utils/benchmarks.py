@@ -0,0 +1,184 @@
+import glob
+import json
+import random
+import sys
+import time
+from decimal import Decimal
+from statistics import mean, median
+
+from geniusweb.bidspace.BidsWithUtility import BidsWithUtility
+from geniusweb.bidspace.Interval import Interval
+from geniusweb.issuevalue.DiscreteValue import DiscreteValue
+from geniusweb.issuevalue.DiscreteValueSet import DiscreteValueSet
+from geniusweb.issuevalue.Domain import Domain
+from geniusweb.profile.utilityspace.DiscreteValueSetUtilities import (
+    DiscreteValueSetUtilities,
+)
+from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import (
+    LinearAdditiveUtilitySpace,
+)
+
+from agents.time_dependent_agent.extended_util_space import ExtendedUtilSpace
+from utils.runners import get_utility_function, run_session
+
+# StupidAgent accepts the first offer it receives, so a session between two of them consists
+# of a single offer and an accept. The session time is therefore almost entirely overhead.
+OVERHEAD_SETTINGS = {
+    "agents": [
+        {"class": "agents.stupid_agent.stupid_agent.StupidAgent"},
+        {"class": "agents.stupid_agent.stupid_agent.StupidAgent"},
+    ],
+    "profiles": ["domains/domain00/profileA.json", "domains/domain00/profileB.json"],
+    "deadline_time_ms": 10000,
+}
+
+
+def main():
+    benchmarks = {
+        "session_engine": benchmark_session_engine,
+        "extended_util_space": benchmark_extended_util_space,
+    }
+    names = sys.argv[1:] or list(benchmarks)
+    for name in names:
+        benchmarks[name]()
+
+
+def benchmark_session_engine(num_sessions: int = 50):
+    """Compare the per-session overhead of geniusweb's runner with the direct session engine."""
+    engines = {
+        "geniusweb": OVERHEAD_SETTINGS,
+        "direct": dict(OVERHEAD_SETTINGS, engine="direct"),
+    }
+
+    print(f"Per-session overhead over {num_sessions} sessions (ms):")
+    for name, settings in engines.items():
+        # warm-up run to exclude import time
+        run_session(settings)
+
+        session_times = []
+        for _ in range(num_sessions):
+            start_time = time.perf_counter()
+            _, results_summary = run_session(settings)
+            session_times.append((time.perf_counter() - start_time) * 1000)
+            assert results_summary["result"] == "agreement"
+
+        print(
+            f"  {name:>10}: mean {mean(session_times):8.2f}, median {median(session_times):8.2f}, "
+            f"min {min(session_times):8.2f}"
+        )
+
+
+def benchmark_extended_util_space(
+    num_largest: int = 3,
+    synthetic_shapes: tuple = ((10,) * 6, (100, 100, 100)),
+    num_queries: int = 200,
+    compare: bool = True,
+):
+    """Compare the sorted utility index of ExtendedUtilSpace with geniusweb's BidsWithUtility
+    on the largest shipped domains and on synthetic domains of 1e6 bids. A query is a turn of
+    the time dependent agents: the bids within the tolerance below a utility goal, of which a
+    random one is created.
+
+    Args:
+        num_largest (int, optional): number of largest shipped domains. Defaults to 3.
+        synthetic_shapes (tuple, optional): number of values per issue of the synthetic
+            domains. Defaults to ((10,) * 6, (100, 100, 100)).
+        num_queries (int, optional): number of utility goals, from the maximum to the minimum
+            utility. Defaults to 200.
+        compare (bool, optional): also run BidsWithUtility, which can take minutes on
+            synthetic domains. Defaults to True.
+    """
+    sizes = []
+    for specials_file in glob.glob("domains/*/specials.json"):
+        with open(specials_file, "r") as f:
+            sizes.append((json.load(f)["size"], specials_file.rsplit("/", 2)[1]))
+    profiles = {
+        f"{name} ({size} bids)": get_utility_function(f"file:domains/{name}/profileA.json")
+        for size, name in sorted(sizes, reverse=True)[:num_largest]
+    }
+    for num_values in synthetic_shapes:
+        name = f"synthetic {'x'.join(map(str, num_values))}"
+        profiles[name] = create_synthetic_profile(name, num_values)
+
+    print(f"Index construction and mean time of {num_queries} queries (ms):")
+    for name, profile in profiles.items():
+        start_time = time.perf_counter()
+        extended_space = ExtendedUtilSpace(profile)
+        build_time = (time.perf_counter() - start_time) * 1000
+        minimum, maximum = extended_space.getMin(), extended_space.getMax()
+        goals = [
+            round(minimum + (maximum - minimum) * Decimal(1 - i / num_queries), 6)
+            for i in range(num_queries)
+        ]
+
+        def query_index(goal):
+            options = extended_space.getBids(goal)
+            return options.get(random.randint(0, options.size() - 1)) if options.size() else None
+
+        results = [("sorted index", build_time, time_queries(query_index, goals))]
+
+        if compare:
+            start_time = time.perf_counter()
+            bids_with_utility = BidsWithUtility.create(profile)
+            bids_with_utility.getRange()
+            build_time = (time.perf_counter() - start_time) * 1000
+            tolerance = extended_space._tolerance
+
+            def query_bids_with_utility(goal):
+                options = bids_with_utility.getBids(Interval(goal - tolerance, goal))
+                return options.get(random.randint(0, options.size() - 1)) if options.size() else None
+
+            results.append(
+                ("BidsWithUtility", build_time, time_queries(query_bids_with_utility, goals))
+            )
+
+        print(f"  {name}:")
+        for method, build_time, query_time in results:
+            print(f"    {method:>16}: construction {build_time:10.2f}, query {query_time:8.3f}")
+
+
+def time_queries(query, goals: list) -> float:
+    """Mean time of a query over a list of utility goals in ms."""
+    start_time = time.perf_counter()
+    for goal in goals:
+        query(goal)
+    return (time.perf_counter() - start_time) * 1000 / len(goals)
+
+
+def create_synthetic_profile(name: str, num_values: tuple, seed: int = 0) -> LinearAdditiveUtilitySpace:
+    """Create a profile with random weights and value utilities (4 decimals) for a domain with
+    the given number of values per issue.
+    """
+    rng = random.Random(seed)
+    issues = [f"issue{i}" for i in range(len(num_values))]
+    domain = Domain(
+        name,
+        {
+            issue: DiscreteValueSet([DiscreteValue(f"value{j}") for j in range(n)])
+            for issue, n in zip(issues, num_values)
+        },
+    )
+
+    # integer weights in 1e-4 that sum to exactly 1
+    weights = [rng.randint(1, 10000) for _ in issues]
+    weights = [w * 10000 // sum(weights) for w in weights]
+    weights[0] += 10000 - sum(weights)
+    utilities = {
+        issue: DiscreteValueSetUtilities(
+            {
+                DiscreteValue(f"value{j}"): Decimal(rng.randint(0, 10000)).scaleb(-4)
+                for j in range(n)
+            }
+        )
+        for issue, n in zip(issues, num_values)
+    }
+    return LinearAdditiveUtilitySpace(
+        domain,
+        name,
+        utilities,
+        {issue: Decimal(w).scaleb(-4) for issue, w in zip(issues, weights)},
+    )
+
+
+if __name__ == "__main__":
+    main()
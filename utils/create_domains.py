@@ -1,8 +1,14 @@
+import hashlib
 import json
-import math
 import os
+import random
+import sys
+import time
+from collections import defaultdict
+from decimal import Decimal
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from itertools import product
-from math import sqrt
+from math import prod, sqrt
 from random import randint
 from shutil import rmtree
 from string import ascii_uppercase
@@ -12,15 +18,197 @@ import numpy as np
 import plotly.graph_objects as go
 from numpy.random import dirichlet
 
+from agents.template_agent.utils.bid_codec import BidCodec
+from agents.template_agent.utils.pareto_solver import (
+    get_pareto_indices,
+    get_special_indices,
+    solve_pareto_front,
+)
+from agents.template_agent.utils.sorted_bids import save_sorted_bids, sort_bids
+
 NUM_DOMAINS_TO_GENERATE = 50
+# domain i is generated with seed SEED + i, a random base seed is used if None
+SEED = None
+NUM_WORKERS = os.cpu_count()
+# maximum number of bid-Pareto point pairs that are evaluated at once to bound memory usage
+DISTANCE_CHUNK_SIZE = 2**22
+# specials of domains with more bids are calculated without enumerating all bids
+ENUMERATION_LIMIT = 2**22
+# domains with more bids than the enumeration limit are represented by a fixed random sample of
+# bids when estimating the distribution and visualising the density of bids
+DISTRIBUTION_SAMPLE_SIZE = 2**20
+DISTRIBUTION_SAMPLE_SEED = 0
+# domains with more bids are visualised as a density of bids instead of a marker per bid,
+# which keeps the rendering time and size of the exported visualisation bounded
+VISUALISATION_SCATTER_LIMIT = 20000
+VISUALISATION_BINS = 200
 
 
 def main():
-    for i in range(NUM_DOMAINS_TO_GENERATE):
-        domain = Domain.create_random(f"domain{i:03d}")
+    # "python -m utils.create_domains sorted_bids" only adds the sorted bids to the existing domains
+    if sys.argv[1:] == ["sorted_bids"]:
+        export_sorted_bids("domains/")
+    else:
+        generate_domains(NUM_DOMAINS_TO_GENERATE, "domains/", SEED, NUM_WORKERS)
+
+
+def export_sorted_bids(parent_path: str):
+    """Write the sorted bids of the profiles of all domains in a directory (see `Domain.sorted_bids_to_file`)."""
+    for name in sorted(os.listdir(parent_path)):
+        directory = os.path.join(parent_path, name)
+        if os.path.exists(os.path.join(directory, "profileA.json")):
+            Domain.from_directory(directory).sorted_bids_to_file(parent_path)
+
+
+def generate_domains(
+    num_domains: int,
+    parent_path: str,
+    seed: int = None,
+    num_workers: int = None,
+    visualise: bool = True,
+) -> dict:
+    """Generate random domains in parallel. Every domain is created and its specials are
+    calculated in a worker process. As soon as a domain is written, the export of its
+    visualisation is scheduled as a separate task, so both stages run concurrently.
+
+    Args:
+        num_domains (int): number of domains to generate
+        parent_path (str): directory to write the domains to
+        seed (int, optional): base seed, domain i is generated with seed + i. Defaults to None (random).
+        num_workers (int, optional): number of worker processes. Defaults to None (number of CPUs).
+        visualise (bool, optional): export a visualisation of every domain. Defaults to True.
+
+    Returns:
+        dict: timings per stage in seconds
+    """
+    if seed is None:
+        seed = random.randrange(2**32)
+    print(f"Generating {num_domains} domains with base seed {seed}")
+
+    start_time = time.perf_counter()
+    stage_times = defaultdict(list)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {
+            executor.submit(
+                create_domain, f"domain{i:03d}", parent_path, (seed + i) % 2**32
+            ): "specials"
+            for i in range(num_domains)
+        }
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = futures.pop(future)
+                name, timings = future.result()
+                for timing_name, timing in timings.items():
+                    stage_times[timing_name].append(timing)
+                if stage == "specials" and visualise:
+                    future = executor.submit(export_visualisation, name, parent_path)
+                    futures[future] = "visualisation"
+    wall_clock_time = time.perf_counter() - start_time
+
+    summary = {
+        stage: {"total": sum(times), "mean": sum(times) / len(times), "max": max(times)}
+        for stage, times in stage_times.items()
+    }
+    summary["wall_clock_time"] = wall_clock_time
+
+    print(f"Generated {num_domains} domains in {wall_clock_time:.1f}s")
+    for stage, times in summary.items():
+        if stage != "wall_clock_time":
+            print(
+                f"  {stage:>13}: total {times['total']:8.2f}s, mean {times['mean']:6.2f}s, "
+                f"max {times['max']:6.2f}s"
+            )
+
+    return summary
+
+
+def create_domain(name: str, parent_path: str, seed: int) -> tuple:
+    """Create a random domain, calculate its specials and write it to file (first pipeline stage)."""
+    random.seed(seed)
+    np.random.seed(seed)
+
+    timings = {}
+    start_time = time.perf_counter()
+    domain = Domain.create_random(name)
+    timings["create"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    domain.calculate_specials()
+    timings["specials"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    domain.to_file(parent_path)
+    timings["write"] = time.perf_counter() - start_time
+
+    return name, timings
+
+
+def export_visualisation(name: str, parent_path: str) -> tuple:
+    """Create the visualisation of a domain on file and export it (second pipeline stage)."""
+    domain = Domain.from_directory(os.path.join(parent_path, name))
+
+    timings = {}
+    start_time = time.perf_counter()
+    domain.generate_visualisation()
+    timings["visualisation"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    domain.visualisation_to_file(parent_path)
+    timings["export"] = time.perf_counter() - start_time
+
+    return name, timings
+
+
+def get_profiles_hash(directory: str) -> str:
+    """SHA-256 hash of the contents of the profiles of a domain directory."""
+    profiles_hash = hashlib.sha256()
+    for profile_file in ("profileA.json", "profileB.json"):
+        with open(os.path.join(directory, profile_file), "rb") as f:
+            profiles_hash.update(f.read())
+    return profiles_hash.hexdigest()
+
+
+def load_specials(directory: str) -> dict:
+    """Load the specials of a domain directory, if they were calculated for the current
+    profiles (the hash of the profiles matches).
+
+    Args:
+        directory (str): domain directory
+
+    Returns:
+        dict: specials, None if they are missing or outdated
+    """
+    specials_path = os.path.join(directory, "specials.json")
+    if not os.path.exists(specials_path):
+        return None
+    with open(specials_path, "r") as f:
+        specials = json.load(f)
+    if specials.get("profiles_hash") != get_profiles_hash(directory):
+        return None
+    return specials
+
+
+def get_specials(directory: str) -> dict:
+    """Get the specials (Pareto front, Nash, Kalai and social welfare bids, opposition and
+    distribution) of a domain directory. They are calculated and stored in the directory
+    only if they are missing or the profiles have changed since they were calculated.
+
+    Args:
+        directory (str): domain directory
+
+    Returns:
+        dict: specials, in the format of specials.json, None if the domain has no Nash bid
+            (no specials are stored, see `Domain.specials_to_file`)
+    """
+    specials = load_specials(directory)
+    if specials is None:
+        directory = os.path.normpath(directory)
+        domain = Domain.from_directory(directory)
         domain.calculate_specials()
-        domain.generate_visualisation()
-        domain.to_file("domains/")
+        domain.specials_to_file(os.path.dirname(directory))
+        specials = load_specials(directory)
+    return specials
 
 
 class Profile:
@@ -103,6 +291,22 @@ class Profile:
             self.issue_weights[i] * self.value_weights[i][v] for i, v in bid.items()
         )
 
+    def get_weighted_decimals(self, issue: str, values: list) -> list:
+        """Weighted utilities of the values of an issue as exact Decimals, as geniusweb reads
+        them from the profile file.
+        """
+        weight = Decimal(repr(float(self.issue_weights[issue])))
+        return [
+            weight * Decimal(repr(float(self.value_weights[issue][v]))) for v in values
+        ]
+
+    def get_weighted_utilities(self, issue: str, values: list) -> np.ndarray:
+        """Weighted utilities (issue weight * value weight) of the values of an issue."""
+        return np.array(
+            [self.issue_weights[issue] * self.value_weights[issue][v] for v in values],
+            dtype=np.float64,
+        )
+
 
 class Domain:
     def __init__(
@@ -129,6 +333,11 @@ class Domain:
         self.opposition = opposition
         self.visualisation = visualisation
 
+        # dense representation of all bids, built on first use (see get_bid_indices)
+        self._codec = None
+        self._bid_indices = None
+        self._utility_matrix = None
+
     @classmethod
     def create_random(cls, name):
         domain_size = randint(200, 10000)
@@ -160,10 +369,9 @@ class Domain:
         profile_A = Profile.from_file(f"{directory}/profileA.json")
         domain = {"name": name, "issuesValues": profile_A.get_issues_values()}
 
-        specials_path = f"{directory}/specials.json"
-        if os.path.exists(specials_path):
-            with open(specials_path, "r") as f:
-                specials = json.load(f)
+        # specials are only used if they were calculated for the current profiles
+        specials = load_specials(directory)
+        if specials is not None:
             return cls(
                 domain,
                 profile_A,
@@ -182,48 +390,43 @@ class Domain:
     def calculate_specials(self):
         if self.nash_bid:
             return False
-        self.pareto_front = self.get_pareto(list(self.iter_bids()))
-        self.distribution = self.get_distribution(self.iter_bids())
-
-        SW_utility = 0
-        nash_utility = 0
-        kalai_diff = 10
-
-        for pareto_bid in self.pareto_front:
-            utility_A, utility_B = pareto_bid["utility"][0], pareto_bid["utility"][1]
-
-            utility_diff = abs(utility_A - utility_B)
-            utility_prod = utility_A * utility_B
-            utility_sum = utility_A + utility_B
-
-            if utility_diff < kalai_diff:
-                self.kalai_bid = pareto_bid
-                kalai_diff = utility_diff
-                self.opposition = sqrt((utility_A - 1.0) ** 2 + (utility_B - 1.0) ** 2)
-            if utility_prod > nash_utility:
-                self.nash_bid = pareto_bid
-                nash_utility = utility_prod
-            if utility_sum > SW_utility:
-                self.SW_bid = pareto_bid
-                SW_utility = utility_sum
+        if self.get_size() > ENUMERATION_LIMIT:
+            self.pareto_front = self.solve_pareto()
+        else:
+            self.pareto_front = self.get_pareto()
+        self.distribution = self.get_distribution()
+
+        utilities_A, utilities_B = np.array(
+            [p["utility"] for p in self.pareto_front], dtype=np.float64
+        ).T
+        special_indices = get_special_indices(utilities_A, utilities_B)
+
+        if special_indices["social_welfare"] is not None:
+            self.SW_bid = self.pareto_front[special_indices["social_welfare"]]
+        if special_indices["nash"] is not None:
+            self.nash_bid = self.pareto_front[special_indices["nash"]]
+        self.kalai_bid = self.pareto_front[special_indices["kalai"]]
+        utility_A, utility_B = self.kalai_bid["utility"]
+        self.opposition = sqrt((utility_A - 1.0) ** 2 + (utility_B - 1.0) ** 2)
 
         return True
 
     def generate_visualisation(self):
-        bid_utils = [self.get_utilities(bid) for bid in self.iter_bids()]
-        bid_utils = list(zip(*bid_utils))
-
         fig = go.Figure()
 
-        fig.add_trace(
-            go.Scatter(
-                x=bid_utils[0],
-                y=bid_utils[1],
-                mode="markers",
-                name="bids",
-                marker=dict(size=3),
+        if self.get_size() > VISUALISATION_SCATTER_LIMIT:
+            fig.add_trace(self.get_density_trace())
+        else:
+            bid_utils = self.get_utility_matrix().T
+            fig.add_trace(
+                go.Scatter(
+                    x=bid_utils[0],
+                    y=bid_utils[1],
+                    mode="markers",
+                    name="bids",
+                    marker=dict(size=3),
+                )
             )
-        )
 
         if self.pareto_front:
             pareto_utils = [bid["utility"] for bid in self.pareto_front]
@@ -268,7 +471,7 @@ class Domain:
 
         fig.update_layout(
             title=dict(
-                text=f"{self.get_name()}<br><sub>(size: {len(list(self.iter_bids()))}, opposition: {self.opposition:.4f}, distribution: {self.distribution:.4f})</sub>",
+                text=f"{self.get_name()}<br><sub>(size: {self.get_size()}, opposition: {self.opposition:.4f}, distribution: {self.distribution:.4f})</sub>",
                 x=0.5,
                 xanchor="center",
             )
@@ -276,6 +479,32 @@ class Domain:
 
         self.visualisation = fig
 
+    def get_density_trace(self) -> go.Heatmap:
+        """Heatmap of the number of bids per bin of utilities (on a log scale), to visualise
+        domains that have too many bids to plot them individually.
+        """
+        edges = np.linspace(0.0, 1.0, VISUALISATION_BINS + 1)
+        utilities_A, utilities_B = self.get_bid_utilities()
+        # rounding can push utilities just outside of [0, 1]
+        counts, _, _ = np.histogram2d(
+            np.clip(utilities_A, 0.0, 1.0), np.clip(utilities_B, 0.0, 1.0), bins=[edges, edges]
+        )
+        # counts of a sample are scaled to the estimated number of bids of the domain
+        counts *= self.get_size() / len(utilities_A)
+
+        centers = (edges[:-1] + edges[1:]) / 2
+        with np.errstate(divide="ignore"):
+            log_counts = np.where(counts > 0, np.log10(counts), np.nan)
+        return go.Heatmap(
+            x=centers,
+            y=centers,
+            z=log_counts.T,
+            name="bids",
+            colorscale="Blues",
+            colorbar=dict(title="log10(bids)", x=1.15),
+            hoverongaps=False,
+        )
+
     def to_file(self, parent_path):
         path = os.path.join(parent_path, self.domain["name"])
         if os.path.exists(path):
@@ -287,24 +516,58 @@ class Domain:
         self.profile_A.to_file(parent_path)
         self.profile_B.to_file(parent_path)
 
+        self.specials_to_file(parent_path)
+        self.sorted_bids_to_file(parent_path)
+
+        self.visualisation_to_file(parent_path)
+
+    def specials_to_file(self, parent_path):
+        """Write the specials to the domain directory, together with the hash of the
+        profiles they were calculated for (see `get_profiles_hash`).
+        """
         if self.nash_bid:
+            path = os.path.join(parent_path, self.domain["name"])
             with open(os.path.join(path, "specials.json"), "w") as f:
                 f.write(
                     json.dumps(
                         {
-                            "size": len(list(self.iter_bids())),
+                            "size": self.get_size(),
                             "opposition": self.opposition,
                             "distribution": self.distribution,
                             "social_welfare": self.SW_bid,
                             "nash": self.nash_bid,
                             "kalai": self.kalai_bid,
                             "pareto_front": self.pareto_front,
+                            "profiles_hash": get_profiles_hash(path),
                         },
                         indent=2,
                     )
                 )
 
+    def sorted_bids_to_file(self, parent_path):
+        """Write the bids sorted on utility of both profiles next to the profiles, such that
+        agents can memory-map them instead of sorting all bids (see `SortedBids`). The bid
+        codes use the sorted issues, like `BidCodec.from_domain`. Skipped for domains that are
+        too large to enumerate.
+        """
+        if self.get_size() > ENUMERATION_LIMIT:
+            return
+        issues_values = self.domain["issuesValues"]
+        codec = BidCodec({i: issues_values[i]["values"] for i in sorted(issues_values)})
+        path = os.path.join(parent_path, self.domain["name"])
+        for profile in (self.profile_A, self.profile_B):
+            weighted_utilities = [
+                profile.get_weighted_decimals(issue, values)
+                for issue, values in zip(codec.issues, codec.values)
+            ]
+            profile_name = profile.profile["LinearAdditiveUtilitySpace"]["name"]
+            save_sorted_bids(
+                os.path.join(path, f"{profile_name}.json"), *sort_bids(weighted_utilities, codec)
+            )
+
+    def visualisation_to_file(self, parent_path):
         if self.visualisation:
+            path = os.path.join(parent_path, self.domain["name"])
             self.visualisation.write_image(
                 file=os.path.join(path, "visualisation.pdf"), scale=5
             )
@@ -313,100 +576,199 @@ class Domain:
         return iter(self)
 
     def get_utilities(self, bid):
-        return self.profile_A.get_utility(bid), self.profile_B.get_utility(bid)
+        """Utilities of a bid dictionary for profile A and B, computed like the utility matrix."""
+        utilities_A, utilities_B = self.get_utility_columns(self.get_value_indices([bid]))
+        return float(utilities_A[0]), float(utilities_B[0])
 
-    def get_pareto(self, all_bids: list):
-        pareto_front = []
-        # dominated_bids = set()
-        while True:
-            candidate_bid = all_bids.pop(0)
-            bid_nr = 0
-            dominated = False
-            while len(all_bids) != 0 and bid_nr < len(all_bids):
-                bid = all_bids[bid_nr]
-                if self._dominates(candidate_bid, bid):
-                    # If it is dominated remove the bid from all bids
-                    all_bids.pop(bid_nr)
-                    # dominated_bids.add(frozenset(bid.items()))
-                elif self._dominates(bid, candidate_bid):
-                    dominated = True
-                    # dominated_bids.add(frozenset(candidate_bid.items()))
-                    bid_nr += 1
-                else:
-                    bid_nr += 1
-
-            if not dominated:
-                # add the non-dominated bid to the Pareto frontier
-                pareto_front.append(
-                    {
-                        "bid": candidate_bid,
-                        "utility": [
-                            self.profile_A.get_utility(candidate_bid),
-                            self.profile_B.get_utility(candidate_bid),
-                        ],
-                    }
-                )
+    def get_value_indices(self, bids: list = None) -> np.ndarray:
+        """Encode bids as a matrix of value indices (bids x issues).
 
-            if len(all_bids) == 0:
-                break
+        Args:
+            bids (list, optional): bid dictionaries. Defaults to None, which encodes all bids
+                of the domain in iteration order.
+
+        Returns:
+            np.ndarray: value indices of the bids
+        """
+        codec = self.get_codec()
+        if bids is None:
+            # same order as product() and the codes of the codec, the last issue changes fastest
+            return (
+                np.indices(codec.radices, dtype=codec.index_dtype)
+                .reshape(len(codec.issues), -1)
+                .T
+            )
+
+        return np.array(
+            [codec.get_bid_value_indices(bid) for bid in bids], dtype=codec.index_dtype
+        ).reshape(len(bids), len(codec.issues))
 
-        pareto_front = sorted(pareto_front, key=lambda d: d["utility"][0])
+    def get_codec(self) -> BidCodec:
+        """Codec that maps the bids of the domain to integers (see `BidCodec`)."""
+        if self._codec is None:
+            self._codec = BidCodec(
+                {i: v["values"] for i, v in self.domain["issuesValues"].items()}
+            )
+        return self._codec
 
-        return pareto_front
+    def get_bid_indices(self) -> np.ndarray:
+        """Value indices of all bids of the domain in iteration order (bids x issues), using the
+        smallest integer type that fits. Built once and shared by all calculations on the domain.
+        """
+        if self._bid_indices is None:
+            self._bid_indices = self.get_value_indices()
+        return self._bid_indices
 
-    def get_distribution(self, bids_iter) -> float:
-        min_distance_sum = 0.0
+    def get_utility_matrix(self) -> np.ndarray:
+        """Utilities of all bids of the domain in iteration order (bids x 2, profile A and B).
+        Built once and shared by all calculations on the domain.
+        """
+        if self._utility_matrix is None:
+            self._utility_matrix = np.column_stack(
+                self.get_utility_columns(self.get_bid_indices())
+            )
+        return self._utility_matrix
 
-        for i, bid in enumerate(bids_iter):
-            min_distance = self.distance_to_pareto(bid)
-            min_distance_sum += min_distance
+    def get_size(self) -> int:
+        """Number of bids in the domain."""
+        return prod(len(v["values"]) for v in self.domain["issuesValues"].values())
 
-        distribution = min_distance_sum / (i + 1)
+    def get_utility_columns(self, value_indices: np.ndarray) -> tuple:
+        """Utilities of both profiles for bids encoded as value indices. The weighted utilities
+        are summed issue by issue, so the results equal those of `Profile.get_utility`.
 
-        return distribution
+        Args:
+            value_indices (np.ndarray): value indices of bids (bids x issues)
 
-    def _dominates(self, bid, candidate_bid):
-        if self.profile_A.get_utility(bid) < self.profile_A.get_utility(candidate_bid):
-            return False
-        elif self.profile_B.get_utility(bid) < self.profile_B.get_utility(
-            candidate_bid
-        ):
-            return False
+        Returns:
+            tuple: utility arrays of profile A and profile B
+        """
+        utility_columns = []
+        for profile in (self.profile_A, self.profile_B):
+            utilities = np.zeros(len(value_indices), dtype=np.float64)
+            for i, (issue, values) in enumerate(self.domain["issuesValues"].items()):
+                weighted_utilities = profile.get_weighted_utilities(issue, values["values"])
+                utilities += weighted_utilities[value_indices[:, i]]
+            utility_columns.append(utilities)
+        return tuple(utility_columns)
+
+    def get_pareto(self, all_bids: list = None):
+        """Calculate the Pareto frontier: all bids that are not dominated by another bid. Of
+        bids with the same utilities, only the first is kept. The frontier is sorted on the
+        utility of profile A.
+
+        Args:
+            all_bids (list, optional): bid dictionaries. Defaults to None, which uses all bids of the domain.
+
+        Returns:
+            list: Pareto frontier with the bids and their utilities
+        """
+        if all_bids is None:
+            value_indices = self.get_bid_indices()
+            utilities_A, utilities_B = self.get_utility_matrix().T
         else:
-            return True
+            value_indices = self.get_value_indices(all_bids)
+            utilities_A, utilities_B = self.get_utility_columns(value_indices)
 
-    def distance_to_pareto(self, bid):
-        if not self.pareto_front:
-            raise ValueError("Pareto front not calculated")
+        pareto_indices = get_pareto_indices(utilities_A, utilities_B)
 
-        min_distance = 5.0
-        for pareto_element in self.pareto_front:
-            pareto_bid = pareto_element["bid"]
-            distance = self.distance(pareto_bid, bid)
-            if distance < min_distance:
-                min_distance = distance
+        if all_bids is None:
+            return self.to_pareto_front(
+                value_indices[pareto_indices],
+                utilities_A[pareto_indices],
+                utilities_B[pareto_indices],
+            )
+        return [
+            {
+                "bid": all_bids[index],
+                "utility": [float(utilities_A[index]), float(utilities_B[index])],
+            }
+            for index in pareto_indices
+        ]
 
-        return min_distance
+    def solve_pareto(self):
+        """Calculate the Pareto frontier without enumerating all bids of the domain, by merging
+        the frontiers of the issues one by one (see `solve_pareto_front`). Results are the same
+        as those of `get_pareto`, except that another bid with exactly the same utilities may be
+        chosen.
 
-    def distance(self, bid1, bid2=None):
-        """calculate Euclidian distance in terms of utility between a bid and 0 or between two bids.
+        Returns:
+            list: Pareto frontier with the bids and their utilities
+        """
+        weighted_utilities = [
+            [
+                profile.get_weighted_utilities(issue, values["values"])
+                for issue, values in self.domain["issuesValues"].items()
+            ]
+            for profile in (self.profile_A, self.profile_B)
+        ]
+        return self.to_pareto_front(*solve_pareto_front(*weighted_utilities))
+
+    def to_pareto_front(self, value_indices, utilities_A, utilities_B):
+        """Convert bids on the Pareto frontier as value indices to the format of `get_pareto`."""
+        bids = self.get_codec().decode_many(self.get_codec().encode_indices(value_indices))
+        return [
+            {"bid": bid, "utility": [utility_A, utility_B]}
+            for bid, utility_A, utility_B in zip(bids, utilities_A.tolist(), utilities_B.tolist())
+        ]
+
+    def get_distribution(self, bids_iter: Iterable = None) -> float:
+        """Calculate the average distance of bids to the closest bid on the Pareto frontier
+        (in terms of utility). Distances are computed in chunks of bids at once. For domains with
+        more bids than ENUMERATION_LIMIT, the average is estimated on a random sample of bids
+        (see `get_bid_utilities`).
 
         Args:
-            bid1 (dict[str, str]): bid dictionary where keys are issues and values are the values
-            bid2 (dict[str, str], optional): see bid1. Defaults to None.
+            bids_iter (Iterable, optional): bid dictionaries. Defaults to None, which uses all bids of the domain.
 
         Returns:
-            float: Euclidian distance
+            float: average distance to the Pareto frontier
         """
-        if bid2 and bid1:
-            a = (self.profile_A.get_utility(bid1) - self.profile_A.get_utility(bid2)) ** 2
-            b = (self.profile_B.get_utility(bid1) - self.profile_B.get_utility(bid2)) ** 2
-        elif bid1:
-            a = self.profile_A.get_utility(bid1) ** 2
-            b = self.profile_B.get_utility(bid1) ** 2
+        if not self.pareto_front:
+            raise ValueError("Pareto front not calculated")
+
+        if bids_iter is not None:
+            value_indices = self.get_value_indices(list(bids_iter))
+            utility_chunks = [self.get_utility_columns(value_indices)]
         else:
-            raise ValueError("receive None bid")
-        return math.sqrt(a + b)
+            utility_chunks = [self.get_bid_utilities()]
+        pareto_utilities = np.array([p["utility"] for p in self.pareto_front], dtype=np.float64)
+
+        chunk_size = max(1, DISTANCE_CHUNK_SIZE // len(pareto_utilities))
+        min_distance_sum, num_bids = 0.0, 0
+        for utilities_A, utilities_B in utility_chunks:
+            min_distances = np.empty(len(utilities_A), dtype=np.float64)
+            for start in range(0, len(utilities_A), chunk_size):
+                end = start + chunk_size
+                squared_distances = np.square(
+                    pareto_utilities[None, :, 0] - utilities_A[start:end, None]
+                ) + np.square(pareto_utilities[None, :, 1] - utilities_B[start:end, None])
+                min_distances[start:end] = np.sqrt(squared_distances.min(axis=1))
+            min_distances = np.minimum(min_distances, 5.0)
+
+            # cumulative sum adds the distances one by one, like a plain loop would
+            min_distance_sum = float(np.cumsum(np.append(min_distance_sum, min_distances))[-1])
+            num_bids += len(min_distances)
+
+        distribution = min_distance_sum / num_bids
+
+        return distribution
+
+    def get_bid_utilities(self) -> tuple:
+        """Utilities of all bids of the domain from the utility matrix. Enumerating all bids is
+        infeasible for domains with more bids than ENUMERATION_LIMIT, those are represented by
+        the utilities of a fixed random sample of DISTRIBUTION_SAMPLE_SIZE bids instead.
+
+        Returns:
+            tuple: utility arrays of profile A and profile B
+        """
+        if self._utility_matrix is None and self.get_size() > ENUMERATION_LIMIT:
+            rng = np.random.default_rng(DISTRIBUTION_SAMPLE_SEED)
+            codes = rng.integers(
+                0, self.get_size(), size=DISTRIBUTION_SAMPLE_SIZE, dtype=np.int64
+            )
+            return self.get_utility_columns(self.get_codec().decode_indices(codes))
+        return tuple(self.get_utility_matrix().T)
 
     def get_name(self):
         return self.domain["name"]
@@ -0,0 +1,127 @@
+import json
+import os
+from math import prod
+from typing import Callable, Dict, List, Tuple
+
+from utils.create_domains import get_profiles_hash, get_specials
+
+CATALOG_FILE = "catalog.json"
+# files of a domain directory that are checked for changes
+DOMAIN_FILES = ("profileA.json", "profileB.json", "specials.json")
+
+
+def update_catalog(domains_dir: str = "domains") -> Dict[str, dict]:
+    """Update the catalog of all domains in a directory and store it as catalog.json in that
+    directory. Only domains of which the files changed since the last update are read again,
+    and specials are only calculated if they are missing or outdated (see `get_specials`).
+
+    Every entry holds the size, number of issues, values per issue, opposition, distribution
+    and hash of the profiles of a domain.
+
+    Args:
+        domains_dir (str, optional): directory with domain directories. Defaults to "domains".
+
+    Returns:
+        Dict[str, dict]: catalog entries by domain name
+    """
+    catalog_path = os.path.join(domains_dir, CATALOG_FILE)
+    catalog = {}
+    if os.path.exists(catalog_path):
+        with open(catalog_path, "r") as f:
+            catalog = json.load(f)
+
+    updated_catalog = {}
+    for name in sorted(os.listdir(domains_dir)):
+        directory = os.path.join(domains_dir, name)
+        if not all(os.path.exists(os.path.join(directory, f)) for f in DOMAIN_FILES[:2]):
+            continue
+
+        entry = catalog.get(name)
+        files_stat = get_files_stat(directory)
+        if entry is None or entry["files_stat"] != files_stat:
+            profiles_hash = get_profiles_hash(directory)
+            if entry is None or entry["profiles_hash"] != profiles_hash:
+                entry = create_catalog_entry(directory)
+            # calculating the specials can change the files
+            entry["files_stat"] = get_files_stat(directory)
+        updated_catalog[name] = entry
+
+    if updated_catalog != catalog:
+        with open(catalog_path, "w") as f:
+            f.write(json.dumps(updated_catalog, indent=2))
+
+    return updated_catalog
+
+
+def create_catalog_entry(directory: str) -> dict:
+    """Create the catalog entry of a domain directory. Domains without specials (no Nash bid)
+    have no opposition and distribution (None).
+    """
+    specials = get_specials(directory)
+    with open(os.path.join(directory, "profileA.json"), "r") as f:
+        profile = json.load(f)
+    issues_values = profile["LinearAdditiveUtilitySpace"]["domain"]["issuesValues"]
+    values_per_issue = [len(v["values"]) for v in issues_values.values()]
+
+    return {
+        "size": prod(values_per_issue),
+        "num_issues": len(issues_values),
+        "values_per_issue": values_per_issue,
+        "opposition": specials["opposition"] if specials else None,
+        "distribution": specials["distribution"] if specials else None,
+        "profiles_hash": get_profiles_hash(directory),
+    }
+
+
+def get_files_stat(directory: str) -> list:
+    """Modification time and size of the files of a domain directory, to detect changes."""
+    files_stat = []
+    for file in DOMAIN_FILES:
+        path = os.path.join(directory, file)
+        if os.path.exists(path):
+            stat = os.stat(path)
+            files_stat.append([file, stat.st_mtime_ns, stat.st_size])
+    return files_stat
+
+
+def select_profile_sets(
+    domains_dir: str = "domains",
+    where: Callable[[dict], bool] = None,
+    update: bool = True,
+    **ranges: Tuple[float, float],
+) -> List[List[str]]:
+    """Select the profile sets of domains from the catalog that match filters, e.g. to use as
+    "profile_sets" in the tournament settings. For example, domains with a high opposition and
+    more than 5000 bids: `select_profile_sets(opposition=(0.5, None), size=(5000, None))`.
+
+    Args:
+        domains_dir (str, optional): directory with domain directories. Defaults to "domains".
+        where (Callable[[dict], bool], optional): function that receives a catalog entry and
+            returns whether to select the domain. Defaults to None.
+        update (bool, optional): update the catalog first (see `update_catalog`). Defaults to True.
+        **ranges (Tuple[float, float]): inclusive (minimum, maximum) of catalog fields, None for no
+            bound. Domains without a value for a field (None) do not match a range on it.
+
+    Returns:
+        List[List[str]]: paths of profile A and profile B of the selected domains
+    """
+    if update:
+        catalog = update_catalog(domains_dir)
+    else:
+        with open(os.path.join(domains_dir, CATALOG_FILE), "r") as f:
+            catalog = json.load(f)
+
+    profile_sets = []
+    for name, entry in catalog.items():
+        in_range = all(
+            entry[field] is not None
+            and (minimum is None or entry[field] >= minimum)
+            and (maximum is None or entry[field] <= maximum)
+            for field, (minimum, maximum) in ranges.items()
+        )
+        if in_range and (where is None or where(entry)):
+            profile_sets.append(
+                [f"{domains_dir}/{name}/profileA.json", f"{domains_dir}/{name}/profileB.json"]
+            )
+
+    return profile_sets
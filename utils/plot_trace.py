@@ -3,6 +3,8 @@ from collections import defaultdict
 
 import plotly.graph_objects as go
 
+from utils.create_domains import get_specials
+
 
 def plot_trace(results_trace: dict, plot_file: str):
     utilities = defaultdict(lambda: defaultdict(lambda: {"x": [], "y": [], "bids": []}))
@@ -60,6 +62,19 @@ def plot_trace(results_trace: dict, plot_file: str):
                 )
             )
 
+    # utility of the Nash and Kalai-Smorodinsky bids for every agent as reference
+    for i, (agent, special_utilities) in enumerate(get_special_utilities(results_trace).items()):
+        name = "_".join(agent.split("_")[-2:])
+        for special, dash in (("nash", "dot"), ("kalai", "dash")):
+            if special in special_utilities:
+                fig.add_hline(
+                    y=special_utilities[special],
+                    line_dash=dash,
+                    line_color=color[i % len(color)],
+                    line_width=1,
+                    annotation_text=f"{name} {special}",
+                )
+
     fig.update_layout(
         # width=1000,
         height=800,
@@ -73,3 +88,36 @@ def plot_trace(results_trace: dict, plot_file: str):
     fig.update_xaxes(title_text="round", range=[0, index + 1], ticks="outside")
     fig.update_yaxes(title_text="utility", range=[0, 1], ticks="outside")
     fig.write_html(f"{os.path.splitext(plot_file)[0]}.html")
+
+
+def get_special_utilities(results_trace: dict) -> dict:
+    """Utility of the Nash and Kalai-Smorodinsky bids of the domain for every agent. Only
+    available for profiles in a domain directory (with profileA.json and profileB.json).
+
+    Args:
+        results_trace (dict): results trace of a session
+
+    Returns:
+        dict: utility per special bid per agent
+    """
+    special_utilities = {}
+    for agent, party_profile in results_trace.get("partyprofiles", {}).items():
+        profile_path = party_profile["profile"].split(":")[-1]
+        directory, profile_file = os.path.split(profile_path)
+        position = {"profileA.json": 0, "profileB.json": 1}.get(profile_file)
+        if position is None or not all(
+            os.path.exists(os.path.join(directory, f))
+            for f in ("profileA.json", "profileB.json")
+        ):
+            continue
+
+        # no specials are stored for domains without a Nash bid
+        specials = get_specials(directory)
+        if specials is None:
+            continue
+        special_utilities[agent] = {
+            special: specials[special]["utility"][position]
+            for special in ("nash", "kalai")
+            if specials[special]
+        }
+    return special_utilities
@@ -0,0 +1,138 @@
+import importlib
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from geniusweb.inform.Settings import Settings
+from geniusweb.inform.YourTurn import YourTurn
+
+try:
+    import resource
+except ImportError:
+    # resource usage is only available on Unix
+    resource = None
+
+# keys of the resource statistics in the session summary, suffixed with the position of the party
+RESOURCE_KEYS = ["compute_time", "turn_time", "turns", "rss_growth_mb", "alloc_peak_mb"]
+
+
+class ResourceMonitor:
+    """Measures the resources that every party of a session uses by wrapping the
+    `notifyChange` method of the party classes while the monitor is active:
+
+    - compute_time: CPU time of the thread that runs `notifyChange`, in seconds
+    - turn_time: average wall-clock time of handling a YourTurn, in seconds
+    - turns: number of YourTurn informs
+    - rss_growth_mb: growth of the peak resident set size of the process during the calls of the party
+    - alloc_peak_mb: peak Python allocations during a call of the party (if `trace_allocations` is set)
+
+    Python allocations are traced with tracemalloc, which slows down the agents considerably,
+    so it is disabled by default.
+    """
+
+    def __init__(self, party_classes: List[type], trace_allocations: bool = False):
+        self.party_classes = list(dict.fromkeys(party_classes))
+        self.trace_allocations = trace_allocations
+
+        self._stats: Dict[int, dict] = {}
+        self._originals = {}
+        self._started_tracing = False
+
+    def __enter__(self):
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        for party_class in self.party_classes:
+            self._originals[party_class] = party_class.__dict__.get("notifyChange")
+            party_class.notifyChange = self._wrap(party_class.notifyChange)
+        return self
+
+    def __exit__(self, *args):
+        for party_class, original in self._originals.items():
+            if original is None:
+                del party_class.notifyChange
+            else:
+                party_class.notifyChange = original
+        self._originals.clear()
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _wrap(self, notify_change):
+        monitor = self
+
+        def notifyChange(party, info):
+            if id(party) not in monitor._stats:
+                monitor._stats[id(party)] = {
+                    "party_id": None,
+                    "active": False,
+                    "compute_time": 0.0,
+                    "turn_time": 0.0,
+                    "turns": 0,
+                    "rss_growth": 0,
+                    "alloc_peak": 0,
+                }
+            stats = monitor._stats[id(party)]
+            if isinstance(info, Settings):
+                stats["party_id"] = str(info.getID())
+
+            # calls to other wrapped methods from within a call (e.g. super) are already measured
+            if stats["active"]:
+                return notify_change(party, info)
+
+            stats["active"] = True
+            if monitor.trace_allocations:
+                alloc_start, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+            rss_start = get_peak_rss()
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            try:
+                return notify_change(party, info)
+            finally:
+                stats["compute_time"] += time.thread_time() - cpu_start
+                if isinstance(info, YourTurn):
+                    stats["turn_time"] += time.perf_counter() - wall_start
+                    stats["turns"] += 1
+                stats["rss_growth"] += get_peak_rss() - rss_start
+                if monitor.trace_allocations:
+                    _, alloc_peak = tracemalloc.get_traced_memory()
+                    stats["alloc_peak"] = max(stats["alloc_peak"], alloc_peak - alloc_start)
+                stats["active"] = False
+
+        return notifyChange
+
+    def get_summary(self) -> dict:
+        """Resource statistics of the parties, with keys suffixed by the position of the party
+        in the session (e.g. "compute_time_1"), like the utilities in the session summary.
+        """
+        summary = {}
+        for stats in self._stats.values():
+            if stats["party_id"] is None:
+                continue
+            position = stats["party_id"].split("_")[-1]
+            summary[f"compute_time_{position}"] = stats["compute_time"]
+            summary[f"turn_time_{position}"] = stats["turn_time"] / max(stats["turns"], 1)
+            summary[f"turns_{position}"] = stats["turns"]
+            summary[f"rss_growth_mb_{position}"] = stats["rss_growth"] / 2**20
+            if self.trace_allocations:
+                summary[f"alloc_peak_mb_{position}"] = stats["alloc_peak"] / 2**20
+        return summary
+
+
+def get_peak_rss() -> int:
+    """Peak resident set size of the process in bytes, 0 if it is not available."""
+    if resource is None:
+        return 0
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def load_party_class(class_path: str) -> type:
+    """Import a party class from its full class path, e.g. "agents.stupid_agent.stupid_agent.StupidAgent"."""
+    module_name, class_name = class_path.rsplit(".", 1)
+    return getattr(importlib.import_module(module_name), class_name)
@@ -0,0 +1,183 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+JOURNAL_FILE = "tournament_journal{}.jsonl"
+TRACES_FILE = "session_traces{}.jsonl"
+
+
+class TournamentSink:
+    """Streams the results of a tournament to JSON Lines files in the results directory as
+    soon as a session ends. Every line of the journal holds the index of the session in the
+    tournament schedule, its settings, summary and statistics. If enabled, the traces of the
+    sessions are written to a separate file in compact form. Lines are flushed to disk
+    directly, such that an interrupted tournament can be resumed from the journal. Shards of
+    a tournament write to their own files, such that they can share a results directory.
+    """
+
+    def __init__(
+        self,
+        results_dir: Path,
+        save_traces: bool = False,
+        resume: bool = False,
+        shard: Tuple[int, int] = None,
+    ):
+        self.journal_path = Path(results_dir, JOURNAL_FILE.format(shard_suffix(shard)))
+        self.traces_path = Path(results_dir, TRACES_FILE.format(shard_suffix(shard)))
+        self.save_traces = save_traces
+
+        if resume:
+            truncate_incomplete_line(self.journal_path)
+            truncate_incomplete_line(self.traces_path)
+        elif self.journal_path.exists():
+            raise FileExistsError(
+                f"Journal {self.journal_path} already exists, set \"resume\" to continue it"
+            )
+
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._traces = (
+            open(self.traces_path, "a", encoding="utf-8") if save_traces else None
+        )
+
+    def write_session(
+        self, index: int, settings: dict, summary: dict, stats: dict, trace: dict = None
+    ):
+        """Append a finished session to the result files.
+
+        Args:
+            index (int): index of the session in the tournament schedule
+            settings (dict): session settings
+            summary (dict): results summary of the session
+            stats (dict): statistics of the session, such as its duration
+            trace (dict, optional): full results trace of the session. Defaults to None.
+        """
+        # the trace is written first, so that a journaled session always has its trace
+        if self._traces is not None and trace is not None:
+            write_line(self._traces, {"index": index, "trace": trace})
+
+        entry = {"index": index, "settings": settings, "summary": summary, "stats": stats}
+        write_line(self._journal, entry)
+
+    def close(self):
+        self._journal.close()
+        if self._traces is not None:
+            self._traces.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_line(file, entry: dict):
+    file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    file.flush()
+    os.fsync(file.fileno())
+
+
+def iter_lines(path: Path) -> Iterator[dict]:
+    """Iterate over the entries of a JSON Lines file. A partially written last line
+    (e.g. the process was killed while writing) is ignored.
+    """
+    if not Path(path).exists():
+        return
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if line.endswith("\n"):
+                    raise
+                print(f"Ignoring incomplete last entry in {path}")
+
+
+def truncate_incomplete_line(path: Path):
+    """Remove a partially written last line from a JSON Lines file, so that new entries
+    can be appended.
+    """
+    if not Path(path).exists():
+        return
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        # search backwards for the end of the last complete line
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            chunk = f.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                end = position - step + newline + 1
+                if end != size:
+                    f.truncate(end)
+                return
+            position -= step
+        f.truncate(0)
+
+
+def shard_suffix(shard: Tuple[int, int] = None) -> str:
+    """Suffix of the result files of a shard, empty if the tournament is not sharded."""
+    if shard is None:
+        return ""
+    shard_index, num_shards = shard
+    return f".shard{shard_index}of{num_shards}"
+
+
+def read_session_journal(results_dir: Path, shard: Tuple[int, int] = None) -> Dict[int, dict]:
+    """Read the finished sessions from the journal of a tournament (shard).
+
+    Args:
+        results_dir (Path): results directory of the tournament
+        shard (Tuple[int, int], optional): shard index and number of shards. Defaults to None.
+
+    Returns:
+        Dict[int, dict]: journal entries by session index
+    """
+    journal_path = Path(results_dir, JOURNAL_FILE.format(shard_suffix(shard)))
+    return {entry["index"]: entry for entry in iter_lines(journal_path)}
+
+
+def load_tournament_results(results_dir: Path) -> Tuple[List[dict], List[dict]]:
+    """Reconstruct the tournament steps and results from the journal of a tournament, in
+    schedule order, e.g. to pass them to `runners.process_tournament_results`. The journals
+    of all shards in the results directory are combined.
+
+    Args:
+        results_dir (Path): results directory of the tournament
+
+    Returns:
+        Tuple[List[dict], List[dict]]: tournament steps and tournament results
+    """
+    entries = {}
+    for journal_path in sorted(Path(results_dir).glob(JOURNAL_FILE.format("*"))):
+        for entry in iter_lines(journal_path):
+            entries[entry["index"]] = entry
+
+    indices = sorted(entries)
+    missing = len(indices) and set(range(indices[-1] + 1)) - set(indices)
+    if missing:
+        print(f"WARNING: {len(missing)} sessions are missing from {results_dir}")
+
+    tournament_steps = [entries[i]["settings"] for i in indices]
+    tournament_results = [entries[i]["summary"] for i in indices]
+    return tournament_steps, tournament_results
+
+
+def iter_session_traces(results_dir: Path) -> Iterator[Tuple[int, dict]]:
+    """Iterate over the saved session traces of a tournament (all shards) without loading them all.
+
+    Args:
+        results_dir (Path): results directory of the tournament
+
+    Yields:
+        Tuple[int, dict]: index of the session in the schedule and its trace
+    """
+    for traces_path in sorted(Path(results_dir).glob(TRACES_FILE.format("*"))):
+        for entry in iter_lines(traces_path):
+            yield entry["index"], entry["trace"]
@@ -1,9 +1,19 @@
+import math
+import multiprocessing
+import os
 import shutil
-from collections import defaultdict
-from itertools import permutations
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from itertools import islice, permutations
 from math import factorial, prod
 from pathlib import Path
-from typing import Tuple
+from typing import List, Tuple
 
 import pandas as pd
 from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import (
@@ -21,6 +31,14 @@ from pyson.ObjectMapper import ObjectMapper
 from uri.uri import URI
 
 from utils.ask_proceed import ask_proceed
+from utils.resource_monitor import RESOURCE_KEYS, ResourceMonitor, load_party_class
+from utils.result_sink import (
+    TournamentSink,
+    load_tournament_results,
+    read_session_journal,
+)
+from utils.session_engine import run_session_direct
+from utils.utility_arrays import UtilityArrays
 
 
 def run_session(settings) -> Tuple[dict, dict]:
@@ -37,9 +55,40 @@ def run_session(settings) -> Tuple[dict, dict]:
     for agent in agents:
         if "parameters" in agent:
             if "storage_dir" in agent["parameters"]:
+                # sessions in parallel workers may create the same directory at the same time
                 storage_dir = Path(agent["parameters"]["storage_dir"])
-                if not storage_dir.exists():
-                    storage_dir.mkdir(parents=True)
+                storage_dir.mkdir(parents=True, exist_ok=True)
+
+    # measure the resources that the parties use during the session
+    party_classes = [load_party_class(agent["class"]) for agent in agents]
+    trace_allocations = settings.get("trace_allocations", False)
+    with ResourceMonitor(party_classes, trace_allocations) as resource_monitor:
+        results_class, results_dict = run_session_protocol(settings)
+
+    # add utilities to the results and create a summary
+    results_trace, results_summary = process_results(results_class, results_dict)
+    results_summary.update(resource_monitor.get_summary())
+
+    return results_trace, results_summary
+
+
+def run_session_protocol(settings: dict) -> Tuple[SAOPState, dict]:
+    """Run the negotiation protocol of a session with the engine selected in the settings.
+
+    Args:
+        settings (dict): session settings, see `run_session`
+
+    Returns:
+        Tuple[SAOPState, dict]: final state of the session in class format and dict format
+    """
+    agents = settings["agents"]
+    profiles = settings["profiles"]
+    deadline_time_ms = settings["deadline_time_ms"]
+
+    # sessions on a virtual clock are run by our own engine, as geniusweb's protocol keeps wall-clock time.
+    # The engine can also be selected explicitly to skip the settings parsing and state serialisation.
+    if "virtual_time" in settings or settings.get("engine") == "direct":
+        return run_session_direct(settings)
 
     # file path to uri
     profiles_uri = [f"file:{x}" for x in profiles]
@@ -97,22 +146,27 @@ def run_session(settings) -> Tuple[dict, dict]:
     results_class: SAOPState = runner.getProtocol().getState()
     results_dict: dict = ObjectMapper().toJson(results_class)["SAOPState"]
 
-    # add utilities to the results and create a summary
-    results_trace, results_summary = process_results(results_class, results_dict)
-
-    return results_trace, results_summary
+    return results_class, results_dict
 
 
-def run_tournament(tournament_settings: dict) -> Tuple[list, list]:
+def run_tournament(tournament_settings: dict, results_dir: Path = None) -> Tuple[list, list]:
     # create agent permutations, ensures that every agent plays against every other agent on both sides of a profile set.
     agents = tournament_settings["agents"]
     profile_sets = tournament_settings["profile_sets"]
-    deadline_time_ms = tournament_settings["deadline_time_ms"]
+    parallel = tournament_settings.get("parallel", False)
+    num_workers = tournament_settings.get("num_workers", os.cpu_count())
+    resume = tournament_settings.get("resume", False)
+    save_traces = tournament_settings.get("save_traces", False)
+    shard = tournament_settings.get("shard", None)
+    session_timeout_s = tournament_settings.get("session_timeout_s", None)
+    if session_timeout_s is not None:
+        assert session_timeout_s * 1000 > tournament_settings["deadline_time_ms"]
 
     num_sessions = (factorial(len(agents)) // factorial(len(agents) - 2)) * len(
         profile_sets
     )
-    if num_sessions > 100:
+    # shards run as non-interactive batch jobs, so they do not ask for confirmation
+    if num_sessions > 100 and shard is None:
         message = (
             f"WARNING: this would run {num_sessions} negotiation sessions. Proceed?"
         )
@@ -120,7 +174,131 @@ def run_tournament(tournament_settings: dict) -> Tuple[list, list]:
             print("Exiting script")
             exit()
 
-    tournament_results = []
+    tournament_steps = get_tournament_schedule(tournament_settings)
+
+    # a shard only runs its own slice of the schedule, sessions are dealt round-robin such
+    # that every shard gets a similar mix of agents and domains
+    if shard is None:
+        session_indices = list(range(len(tournament_steps)))
+    else:
+        shard_index, num_shards = shard
+        assert 0 <= shard_index < num_shards
+        session_indices = list(range(shard_index, len(tournament_steps), num_shards))
+
+    # every finished session is streamed to the results directory, so that an
+    # interrupted tournament can be resumed from it
+    session_outputs = {}
+    if resume:
+        if results_dir is None:
+            raise ValueError("Resuming a tournament requires a results directory")
+        for index, entry in read_session_journal(results_dir, shard).items():
+            if index >= len(tournament_steps) or entry["settings"] != tournament_steps[index]:
+                raise ValueError(
+                    f"Session {index} in {results_dir} does not match the tournament settings"
+                )
+            session_outputs[index] = (entry["summary"], None)
+        print(f"Resuming tournament, skipping {len(session_outputs)} finished sessions")
+
+    pending = [i for i in session_indices if i not in session_outputs]
+
+    sink = TournamentSink(results_dir, save_traces, resume, shard) if results_dir else None
+    try:
+        start_time = time.time()
+        if session_timeout_s is not None:
+            # every session runs in its own supervised process, the threads only wait for them
+            executor_class, run_function = ThreadPoolExecutor, run_supervised_session
+            session_args = (save_traces, session_timeout_s)
+        else:
+            executor_class, run_function = ProcessPoolExecutor, run_tournament_session
+            session_args = (save_traces,)
+
+        if parallel and num_workers > 1:
+            # sessions are farmed out to workers and written as soon as they finish, only a
+            # few sessions per worker are in flight so that finished traces are not held back
+            with executor_class(max_workers=num_workers) as executor:
+                remaining = iter(pending)
+                futures = {}
+                while True:
+                    for index in islice(remaining, 2 * num_workers - len(futures)):
+                        future = executor.submit(
+                            run_function, tournament_steps[index], *session_args
+                        )
+                        futures[future] = index
+                    if not futures:
+                        break
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index = futures.pop(future)
+                        summary, stats, trace = future.result()
+                        session_outputs[index] = (summary, stats)
+                        if sink:
+                            sink.write_session(index, tournament_steps[index], summary, stats, trace)
+        else:
+            for index in pending:
+                summary, stats, trace = run_function(tournament_steps[index], *session_args)
+                session_outputs[index] = (summary, stats)
+                if sink:
+                    sink.write_session(index, tournament_steps[index], summary, stats, trace)
+        wall_clock_time = time.time() - start_time
+    finally:
+        if sink:
+            sink.close()
+
+    # restore the schedule order, independent of the order in which sessions finished
+    tournament_steps = [tournament_steps[i] for i in session_indices]
+    tournament_results = [session_outputs[i][0] for i in session_indices]
+    session_stats = [session_outputs[i][1] for i in pending]
+    sessions_time = sum(stats["session_time"] for stats in session_stats)
+
+    tournament_results_summary = process_tournament_results(tournament_results)
+
+    # report timing of the tournament, the speedup is the summed session time over the wall-clock time
+    tournament_results_summary.attrs["wall_clock_time"] = wall_clock_time
+    tournament_results_summary.attrs["sessions_time"] = sessions_time
+    tournament_results_summary.attrs["speedup"] = sessions_time / max(wall_clock_time, 1e-9)
+    print(
+        f"Ran {len(pending)} sessions in {wall_clock_time:.1f}s "
+        f"(summed session time {sessions_time:.1f}s, speedup {tournament_results_summary.attrs['speedup']:.2f}x)"
+    )
+
+    # report the effectiveness of the utility function cache, summed over all (worker) processes
+    tournament_results_summary.attrs["utility_cache"] = {
+        "hits": sum(stats["utility_cache_hits"] for stats in session_stats),
+        "misses": sum(stats["utility_cache_misses"] for stats in session_stats),
+    }
+
+    return tournament_steps, tournament_results, tournament_results_summary
+
+
+def merge_tournament_shards(results_dir: Path) -> pd.DataFrame:
+    """Merge the results of all shards of a tournament in a results directory and save the
+    combined summary as `tournament_results_summary.csv`.
+
+    Args:
+        results_dir (Path): results directory that is shared by the shards
+
+    Returns:
+        pd.DataFrame: tournament results summary
+    """
+    _, tournament_results = load_tournament_results(results_dir)
+    tournament_results_summary = process_tournament_results(tournament_results)
+    tournament_results_summary.to_csv(Path(results_dir, "tournament_results_summary.csv"))
+    return tournament_results_summary
+
+
+def get_tournament_schedule(tournament_settings: dict) -> List[dict]:
+    """Create the ordered list of session settings that make up a tournament.
+
+    Args:
+        tournament_settings (dict): tournament settings, see `run_tournament`
+
+    Returns:
+        List[dict]: session settings in the order in which they are run and reported
+    """
+    agents = tournament_settings["agents"]
+    profile_sets = tournament_settings["profile_sets"]
+    deadline_time_ms = tournament_settings["deadline_time_ms"]
+
     tournament_steps = []
     for profiles in profile_sets:
         # quick an dirty check
@@ -132,17 +310,156 @@ def run_tournament(tournament_settings: dict) -> Tuple[list, list]:
                 "profiles": profiles,
                 "deadline_time_ms": deadline_time_ms,
             }
+            for key in ["engine", "virtual_time", "trace_allocations"]:
+                if key in tournament_settings:
+                    settings[key] = tournament_settings[key]
+            if "seed" in tournament_settings:
+                # every session gets its own seed, such that the tournament is reproducible
+                settings["seed"] = tournament_settings["seed"] + len(tournament_steps)
+            tournament_steps.append(settings)
 
-            # run a single negotiation session
-            _, session_results_summary = run_session(settings)
+    return tournament_steps
 
-            # assemble results
-            tournament_steps.append(settings)
-            tournament_results.append(session_results_summary)
 
-    tournament_results_summary = process_tournament_results(tournament_results)
+def run_tournament_session(settings: dict, save_trace: bool = False) -> Tuple[dict, dict, dict]:
+    """Run a single negotiation session of a tournament and gather statistics about the run.
+    The full trace is only returned on request, as it is expensive to send back from a worker process.
 
-    return tournament_steps, tournament_results, tournament_results_summary
+    Args:
+        settings (dict): session settings, see `run_session`
+        save_trace (bool, optional): return the results trace. Defaults to False.
+
+    Returns:
+        Tuple[dict, dict, dict]: results summary, statistics of the session (duration in seconds
+            and utility function cache hits and misses) and the results trace or None
+    """
+    cache_info_start = get_utility_cache_info()
+    start_time = time.time()
+    session_results_trace, session_results_summary = run_session(settings)
+    session_time = time.time() - start_time
+    cache_info_end = get_utility_cache_info()
+
+    session_stats = {
+        "session_time": session_time,
+        "utility_cache_hits": cache_info_end["hits"] - cache_info_start["hits"],
+        "utility_cache_misses": cache_info_end["misses"] - cache_info_start["misses"],
+    }
+    if not save_trace:
+        session_results_trace = None
+    return session_results_summary, session_stats, session_results_trace
+
+
+# supervised sessions are started from the threads of the watchdog, forking a multi-threaded
+# process can leave locks of other threads (e.g. of stdout) locked in the child. They are
+# therefore started from a single-threaded fork server, which imports the runners once.
+SUPERVISED_START_METHOD = (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+_supervised_context = multiprocessing.get_context(SUPERVISED_START_METHOD)
+if SUPERVISED_START_METHOD == "forkserver":
+    _supervised_context.set_forkserver_preload(["utils.runners"])
+
+def run_supervised_session(
+    settings: dict, save_trace: bool, timeout_s: float
+) -> Tuple[dict, dict, dict]:
+    """Run a single negotiation session of a tournament in a separate process under a hard
+    wall-clock and CPU time limit. If the session exceeds the limit, the process is killed.
+    Sessions that are killed or crash are recorded as "ERROR" with the reason.
+
+    Args:
+        settings (dict): session settings, see `run_session`
+        save_trace (bool): return the results trace
+        timeout_s (float): hard time limit of the session in seconds, should be above the deadline
+
+    Returns:
+        Tuple[dict, dict, dict]: see `run_tournament_session`
+    """
+    receiver, sender = _supervised_context.Pipe(duplex=False)
+    process = _supervised_context.Process(
+        target=supervised_session_worker, args=(sender, settings, save_trace, timeout_s)
+    )
+
+    start_time = time.time()
+    process.start()
+    sender.close()
+
+    output, error = None, None
+    if receiver.poll(timeout_s):
+        try:
+            output = receiver.recv()
+        except EOFError:
+            pass
+    else:
+        error = f"session exceeded the time limit of {timeout_s}s and was killed"
+
+    # stop the process, kill it if it does not respond
+    process.join(1)
+    if process.is_alive():
+        process.terminate()
+        process.join(1)
+    if process.is_alive():
+        process.kill()
+        process.join()
+    receiver.close()
+
+    if isinstance(output, str):
+        error, output = output, None
+    if output is None:
+        if error is None:
+            error = f"session process died with exit code {process.exitcode}"
+        session_stats = {
+            "session_time": time.time() - start_time,
+            "utility_cache_hits": 0,
+            "utility_cache_misses": 0,
+        }
+        return get_error_summary(settings, error), session_stats, None
+
+    return output
+
+
+def supervised_session_worker(connection, settings: dict, save_trace: bool, timeout_s: float):
+    """Entry point of the process of a supervised session. Sends the output of
+    `run_tournament_session` or a description of the error over the connection.
+    """
+    try:
+        import resource
+
+        cpu_limit = math.ceil(timeout_s)
+        _, hard_limit = resource.getrlimit(resource.RLIMIT_CPU)
+        if hard_limit == resource.RLIM_INFINITY or hard_limit > cpu_limit:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, hard_limit))
+    except ImportError:
+        # CPU limits are only available on Unix, the wall-clock limit still applies
+        pass
+
+    try:
+        output = run_tournament_session(settings, save_trace)
+    except Exception as e:
+        output = f"{e.__class__.__name__}: {e}"
+    connection.send(output)
+    connection.close()
+
+
+def get_error_summary(settings: dict, error: str) -> dict:
+    """Results summary of a session that did not finish.
+
+    Args:
+        settings (dict): session settings
+        error (str): reason why the session did not finish
+
+    Returns:
+        dict: results summary with result "ERROR"
+    """
+    results_summary = {"num_offers": 0}
+    for position, agent in enumerate(settings["agents"], 1):
+        results_summary[f"agent_{position}"] = agent["class"].split(".")[-1]
+        results_summary[f"utility_{position}"] = 0
+    results_summary["nash_product"] = 0
+    results_summary["social_welfare"] = 0
+    results_summary["result"] = "ERROR"
+    results_summary["error"] = error
+
+    return results_summary
 
 
 def process_results(results_class: SAOPState, results_dict: dict):
@@ -156,15 +473,16 @@ def process_results(results_class: SAOPState, results_dict: dict):
 
     # check if there are any actions (could have crashed)
     if results_dict["actions"]:
-        # obtain utility functions
+        # obtain utility functions, compiled to lookup arrays
         utility_funcs = {
-            k: get_utility_function(v["profile"])
+            k: get_utility_arrays(v["profile"])
             for k, v in results_dict["partyprofiles"].items()
         }
 
         # iterate both action classes and dict entries
         actions_iter = zip(results_class.getActions(), results_dict["actions"])
 
+        offers, bids = [], []
         for action_class, action_dict in actions_iter:
             if "Offer" in action_dict:
                 offer = action_dict["Offer"]
@@ -173,19 +491,23 @@ def process_results(results_class: SAOPState, results_dict: dict):
             else:
                 continue
 
-            # add bid utility of both agents if bid is not None
+            # collect the bids to annotate with the utility of both agents
             bid = action_class.getBid()
             if bid is None:
                 raise ValueError(
                     f"Found `None` value in sequence of actions: {action_class}"
                 )
             else:
-                offer["utilities"] = {
-                    k: float(v.getUtility(bid)) for k, v in utility_funcs.items()
-                }
+                offers.append(offer)
+                bids.append(bid)
 
             results_summary["num_offers"] += 1
 
+        # compute the utilities of all bids in the trace at once for every agent
+        utilities = {k: v.get_utilities(bids) for k, v in utility_funcs.items()}
+        for i, offer in enumerate(offers):
+            offer["utilities"] = {k: v[i] for k, v in utilities.items()}
+
         # gather a summary of results
         if "Accept" in action_dict:
             utilities_final = list(offer["utilities"].values())
@@ -208,16 +530,72 @@ def process_results(results_class: SAOPState, results_dict: dict):
     return results_dict, results_summary
 
 
+# parsed utility functions are shared by all sessions in a process, keyed by the profile URI
+# and the modification time and size of the profile file, such that edited profiles are reloaded.
+UTILITY_CACHE_SIZE = 64
+_utility_cache: "OrderedDict[tuple, LinearAdditiveUtilitySpace]" = OrderedDict()
+_utility_arrays_cache: "OrderedDict[tuple, UtilityArrays]" = OrderedDict()
+_utility_cache_info = {"hits": 0, "misses": 0}
+
+
 def get_utility_function(profile_uri) -> LinearAdditiveUtilitySpace:
+    cache_key = get_utility_cache_key(profile_uri)
+    if cache_key in _utility_cache:
+        _utility_cache_info["hits"] += 1
+        _utility_cache.move_to_end(cache_key)
+        return _utility_cache[cache_key]
+    _utility_cache_info["misses"] += 1
+
     profile_connection = ProfileConnectionFactory.create(
         URI(profile_uri), StdOutReporter()
     )
     profile = profile_connection.getProfile()
     assert isinstance(profile, LinearAdditiveUtilitySpace)
 
+    if cache_key is not None:
+        _utility_cache[cache_key] = profile
+        if len(_utility_cache) > UTILITY_CACHE_SIZE:
+            _utility_cache.popitem(last=False)
+
     return profile
 
 
+def get_utility_arrays(profile_uri) -> UtilityArrays:
+    """Utility function of a profile compiled to lookup arrays, cached like `get_utility_function`."""
+    cache_key = get_utility_cache_key(profile_uri)
+    if cache_key in _utility_arrays_cache:
+        _utility_cache_info["hits"] += 1
+        _utility_arrays_cache.move_to_end(cache_key)
+        return _utility_arrays_cache[cache_key]
+
+    utility_arrays = UtilityArrays(get_utility_function(profile_uri))
+
+    if cache_key is not None:
+        _utility_arrays_cache[cache_key] = utility_arrays
+        if len(_utility_arrays_cache) > UTILITY_CACHE_SIZE:
+            _utility_arrays_cache.popitem(last=False)
+
+    return utility_arrays
+
+
+def get_utility_cache_key(profile_uri: str) -> tuple:
+    """Create the cache key of a profile. Only profiles on the local file system are
+    cached, None is returned for other profiles.
+    """
+    if not profile_uri.startswith("file:"):
+        return None
+    try:
+        stat = os.stat(profile_uri[len("file:"):])
+    except OSError:
+        return None
+    return profile_uri, stat.st_mtime_ns, stat.st_size
+
+
+def get_utility_cache_info() -> dict:
+    """Hits, misses and size of the utility function cache of this process."""
+    return dict(_utility_cache_info, size=len(_utility_cache), maxsize=UTILITY_CACHE_SIZE)
+
+
 def process_tournament_results(tournament_results):
     agent_result_raw = defaultdict(lambda: defaultdict(list))
     tournament_results_summary = defaultdict(lambda: defaultdict(int))
@@ -237,12 +615,17 @@ def process_tournament_results(tournament_results):
                 agent_result_raw[agent_class]["num_offers"].append(
                     session_results["num_offers"]
                 )
+            for key in RESOURCE_KEYS:
+                resource_key = f"{key}_{agent_id.split('_')[1]}"
+                if resource_key in session_results:
+                    agent_result_raw[agent_class][key].append(session_results[resource_key])
             tournament_results_summary[agent_class][session_results["result"]] += 1
 
     for agent, stats in agent_result_raw.items():
         num_session = len(stats["utility"])
         for desc, stat in stats.items():
-            stat_average = sum(stat) / num_session
+            # resource statistics are averaged over the sessions in which they were measured
+            stat_average = sum(stat) / (len(stat) if desc in RESOURCE_KEYS else num_session)
             tournament_results_summary[agent][f"avg_{desc}"] = stat_average
         tournament_results_summary[agent]["count"] = num_session
 
@@ -262,6 +645,13 @@ def process_tournament_results(tournament_results):
         "failed": int,
         "ERROR": int,
     }
+    # resource statistics are only added if they were measured
+    resource_columns = [f"avg_{key}" for key in RESOURCE_KEYS]
+    column_order += [
+        column
+        for column in resource_columns
+        if any(column in stats for stats in tournament_results_summary.values())
+    ]
 
     # results dictionary to dataframe
     tournament_results_summary = pd.DataFrame(tournament_results_summary).T
@@ -0,0 +1,224 @@
+import importlib
+import random
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+import numpy as np
+from geniusweb.actions.Accept import Accept
+from geniusweb.actions.Action import Action
+from geniusweb.actions.EndNegotiation import EndNegotiation
+from geniusweb.actions.Offer import Offer
+from geniusweb.actions.PartyId import PartyId
+from geniusweb.inform.ActionDone import ActionDone
+from geniusweb.inform.Agreements import Agreements
+from geniusweb.inform.Finished import Finished
+from geniusweb.inform.Inform import Inform
+from geniusweb.inform.Settings import Settings
+from geniusweb.inform.YourTurn import YourTurn
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.party.DefaultParty import DefaultParty
+from geniusweb.progress.ProgressTime import ProgressTime
+from geniusweb.references.Parameters import Parameters
+from geniusweb.references.ProfileRef import ProfileRef
+from geniusweb.references.ProtocolRef import ProtocolRef
+from uri.uri import URI
+
+from utils.virtual_time import VirtualClock, VirtualProgressTime
+
+
+class PartyConnection:
+    """Minimal in-process connection between the session engine and a party. Actions that
+    the party sends are collected until the engine picks them up.
+    """
+
+    def __init__(self, party_id: PartyId):
+        self._party_id = party_id
+        self._listeners = []
+        self.actions: List[Action] = []
+
+    def send(self, action: Action):
+        self.actions.append(action)
+
+    def addListener(self, listener):
+        self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def getReference(self) -> PartyId:
+        return self._party_id
+
+    def getRemoteURI(self):
+        return None
+
+    def getError(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class SessionState:
+    """Result of a session run by the engine. Exposes the actions through the same
+    `getActions` method as geniusweb's SAOPState, so that it can be processed in the same way.
+    """
+
+    def __init__(self, actions: List[Action]):
+        self._actions = actions
+
+    def getActions(self) -> List[Action]:
+        return self._actions
+
+
+def run_session_direct(settings: dict) -> Tuple[SessionState, dict]:
+    """Run a SAOP negotiation session by instantiating and calling the parties directly,
+    without geniusweb's runner, the settings parsing and the serialisation of the final state.
+    Time is kept by the wall-clock, or by a VirtualClock (see `virtual_time`) if the settings
+    contain a "virtual_time" entry.
+
+    Args:
+        settings (dict): session settings, see `runners.run_session`
+
+    Returns:
+        Tuple[SessionState, dict]: actions of the session and the session in the same
+            dictionary format as a serialised SAOPState
+    """
+    agents = settings["agents"]
+    profiles = settings["profiles"]
+    deadline_time_ms = settings["deadline_time_ms"]
+
+    if "seed" in settings:
+        random.seed(settings["seed"])
+        np.random.seed(settings["seed"])
+
+    if "virtual_time" in settings:
+        clock = VirtualClock(**settings["virtual_time"])
+        progress = VirtualProgressTime(deadline_time_ms, clock)
+    else:
+        clock = None
+        progress = ProgressTime(deadline_time_ms, datetime.now())
+    protocol = ProtocolRef(URI("SAOP"))
+
+    # instantiate and connect the parties
+    party_ids, parties, connections, party_profiles = [], [], [], {}
+    for position, (agent, profile) in enumerate(zip(agents, profiles), 1):
+        module_name, class_name = agent["class"].rsplit(".", 1)
+        party_class = getattr(importlib.import_module(module_name), class_name)
+        party_id = PartyId(f"{class_name}_{position}")
+        party: DefaultParty = party_class()
+        connection = PartyConnection(party_id)
+        party.connect(connection)
+
+        party_ids.append(party_id)
+        parties.append(party)
+        connections.append(connection)
+        party_profiles[str(party_id)] = {
+            "party": {
+                "partyref": f"pythonpath:{agent['class']}",
+                "parameters": agent.get("parameters", {}),
+            },
+            "profile": f"file:{profile}",
+        }
+
+    def deliver(index: int, info: Inform):
+        if clock is None:
+            parties[index].notifyChange(info)
+            return
+        clock.start_call()
+        try:
+            parties[index].notifyChange(info)
+        finally:
+            clock.end_call()
+
+    def past_deadline() -> bool:
+        return progress.isPastDeadline(time.time() * 1000)
+
+    actions: List[Action] = []
+    error = None
+    agreement: Bid = None
+    try:
+        for index, party_id in enumerate(party_ids):
+            agent = agents[index]
+            parameters = Parameters(agent.get("parameters", {}))
+            profile_ref = ProfileRef(URI(party_profiles[str(party_id)]["profile"]))
+            deliver(index, Settings(party_id, profile_ref, protocol, progress, parameters))
+
+        # informs are immutable, so a single YourTurn is shared by all turns
+        your_turn = YourTurn()
+        turn = 0
+        last_offer: Bid = None
+        while not past_deadline():
+            index = turn % len(parties)
+            connection = connections[index]
+            connection.actions.clear()
+            deliver(index, your_turn)
+            if clock is not None:
+                clock.end_turn()
+
+            # actions that arrive after the deadline are ignored
+            if past_deadline():
+                break
+            if not connection.actions:
+                error = f"{party_ids[index]} did not act on its turn"
+                break
+
+            action = connection.actions[0]
+            if action.getActor() != party_ids[index]:
+                error = f"{party_ids[index]} acted on behalf of {action.getActor()}"
+                break
+            if isinstance(action, Accept) and action.getBid() != last_offer:
+                error = f"{party_ids[index]} accepted a bid that was not offered"
+                break
+            if not isinstance(action, (Offer, Accept, EndNegotiation)):
+                error = f"{party_ids[index]} sent unsupported action {action}"
+                break
+
+            actions.append(action)
+            for other in range(len(parties)):
+                deliver(other, ActionDone(action))
+
+            if isinstance(action, Offer):
+                last_offer = action.getBid()
+            elif isinstance(action, Accept):
+                agreement = action.getBid()
+                break
+            else:
+                break
+
+            turn += 1
+    except Exception as e:
+        error = f"{e.__class__.__name__}: {e}"
+
+    # inform the parties about the end of the session
+    agreements = Agreements({party_id: agreement for party_id in party_ids} if agreement else {})
+    for index in range(len(parties)):
+        try:
+            deliver(index, Finished(agreements))
+        except Exception:
+            pass
+
+    results_dict = {
+        "actions": [action_to_dict(action) for action in actions],
+        "connections": [str(party_id) for party_id in party_ids],
+        "partyprofiles": party_profiles,
+        "progress": {
+            "duration": deadline_time_ms,
+            "virtual_time_ms": clock.now_ms() if clock is not None else None,
+        },
+        "error": error,
+    }
+
+    return SessionState(actions), results_dict
+
+
+def action_to_dict(action: Action) -> dict:
+    """Convert an action to the dictionary format that geniusweb's ObjectMapper produces."""
+    action_dict = {"actor": str(action.getActor())}
+    if isinstance(action, (Offer, Accept)):
+        issue_values = action.getBid().getIssueValues()
+        action_dict["bid"] = {
+            "issuevalues": {i: v.getValue() for i, v in issue_values.items()}
+        }
+    return {action.__class__.__name__: action_dict}
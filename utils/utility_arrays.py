@@ -0,0 +1,109 @@
+from decimal import Decimal
+from typing import List
+
+import numpy as np
+from geniusweb.issuevalue.Bid import Bid
+from geniusweb.profile.utilityspace.LinearAdditiveUtilitySpace import (
+    LinearAdditiveUtilitySpace,
+)
+
+# utilities are summed exactly as integers, which requires that the scaled sums can be
+# represented exactly by a float64 before the final division
+MAX_EXACT_INT = 2**53
+MAX_SCALE = 15
+
+
+class UtilityArrays:
+    """Per-issue lookup arrays of a LinearAdditiveUtilitySpace to compute the utilities
+    of many bids in one batched operation.
+
+    The weighted value utilities (weight * value utility) are Decimals with few digits.
+    They are scaled by a power of 10 to exact integers, so the sum over the issues is
+    exact, and a single division gives the same float as `float(profile.getUtility(bid))`.
+    If the profile has too many digits for this, the Decimal utilities are used instead.
+    """
+
+    def __init__(self, profile: LinearAdditiveUtilitySpace):
+        self.profile = profile
+        self.issues = list(profile.getWeights().keys())
+
+        weighted_utilities = []
+        self.value_indices = []
+        for issue in self.issues:
+            weight = profile.getWeight(issue)
+            value_utilities = profile.getUtilities()[issue]
+            values = list(profile.getDomain().getValues(issue))
+            self.value_indices.append({value: i for i, value in enumerate(values)})
+            weighted_utilities.append(
+                [weight * value_utilities.getUtility(value) for value in values]
+            )
+
+        # the last column is used for values that are missing from a bid (utility 0)
+        self.missing_index = max(len(utilities) for utilities in weighted_utilities)
+        self.scale = get_decimal_scale(
+            [u for utilities in weighted_utilities for u in utilities]
+        )
+
+        self.int_utilities = None
+        if self.scale is not None:
+            int_utilities = [
+                [int(u.scaleb(self.scale)) for u in utilities]
+                for utilities in weighted_utilities
+            ]
+            max_sum = sum(
+                max([abs(u) for u in utilities] + [0]) for utilities in int_utilities
+            )
+            if max_sum < MAX_EXACT_INT:
+                self.int_utilities = np.zeros(
+                    (len(self.issues), self.missing_index + 1), dtype=np.int64
+                )
+                for i, utilities in enumerate(int_utilities):
+                    self.int_utilities[i, : len(utilities)] = utilities
+
+    def get_value_indices(self, bids: List[Bid]) -> np.ndarray:
+        """Encode bids as a matrix of value indices (bids x issues)."""
+        return np.array(
+            [
+                [
+                    value_index.get(bid.getValue(issue), self.missing_index)
+                    for issue, value_index in zip(self.issues, self.value_indices)
+                ]
+                for bid in bids
+            ],
+            dtype=np.int64,
+        ).reshape(len(bids), len(self.issues))
+
+    def get_utilities(self, bids: List[Bid]) -> List[float]:
+        """Compute the utilities of a sequence of bids.
+
+        Args:
+            bids (List[Bid]): bids to compute the utilities for
+
+        Returns:
+            List[float]: utilities, identical to `float(profile.getUtility(bid))`
+        """
+        if self.int_utilities is None:
+            return [float(self.profile.getUtility(bid)) for bid in bids]
+
+        value_indices = self.get_value_indices(bids)
+        issue_indices = np.arange(len(self.issues))
+        int_sums = self.int_utilities[issue_indices, value_indices].sum(axis=1)
+
+        # both operands are exact float64 values, so the division is correctly rounded
+        return (int_sums.astype(np.float64) / float(10**self.scale)).tolist()
+
+
+def get_decimal_scale(decimals: List[Decimal]) -> int:
+    """Smallest power of 10 that turns all decimals into integers, or None if that power
+    is too large for exact float64 arithmetic.
+    """
+    scale = 0
+    for d in decimals:
+        if not d.is_finite():
+            return None
+        if d == 0:
+            continue
+        scale = max(scale, -d.as_tuple().exponent)
+    if scale > MAX_SCALE:
+        return None
+    return scale
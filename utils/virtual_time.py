@@ -0,0 +1,66 @@
+import time
+from datetime import datetime, timedelta
+
+from geniusweb.progress.ProgressTime import ProgressTime
+
+
+class VirtualClock:
+    """Deterministic session clock that replaces wall-clock time. The clock only advances
+    through the compute time that agents spend inside their calls (scaled by
+    `compute_factor`) and a fixed cost per turn. Setting `compute_factor` to 0.0 makes the
+    clock fully independent of the machine, which together with a fixed seed makes sessions
+    reproducible. Note that agents that busy-wait on the progress will never finish a turn
+    in that case.
+    """
+
+    def __init__(self, turn_cost_ms: float = 10.0, compute_factor: float = 1.0):
+        self.turn_cost_ms = turn_cost_ms
+        self.compute_factor = compute_factor
+
+        self._elapsed_ms = 0.0
+        self._call_start = None
+
+    def now_ms(self) -> float:
+        """Virtual time in milliseconds since the start of the session. Compute time of the
+        call that is currently running is included, so progress keeps moving within a turn.
+        """
+        if self._call_start is None:
+            return self._elapsed_ms
+        running_ms = (time.thread_time() - self._call_start) * 1000
+        return self._elapsed_ms + self.compute_factor * running_ms
+
+    def start_call(self):
+        """Start measuring the compute time of a call into an agent."""
+        self._call_start = time.thread_time()
+
+    def end_call(self):
+        """Stop measuring the compute time of a call and add it to the clock."""
+        self._elapsed_ms = self.now_ms()
+        self._call_start = None
+
+    def end_turn(self):
+        """Add the fixed cost of a turn to the clock."""
+        self._elapsed_ms += self.turn_cost_ms
+
+
+class VirtualProgressTime(ProgressTime):
+    """ProgressTime that reads the time from a VirtualClock instead of the timestamp that
+    is passed by the agent. Agents can keep calling `progress.get(time() * 1000)`.
+    """
+
+    def __init__(self, duration: int, clock: VirtualClock):
+        super().__init__(duration, datetime.now())
+        self._clock = clock
+
+    def get(self, currentTimeMs: int) -> float:
+        return min(1.0, self._clock.now_ms() / self.getDuration())
+
+    def isPastDeadline(self, currentTimeMs: int) -> bool:
+        return self._clock.now_ms() > self.getDuration()
+
+    def getStart(self) -> datetime:
+        # map the virtual start time to the wall-clock for agents that use absolute timestamps
+        return datetime.now() - timedelta(milliseconds=self._clock.now_ms())
+
+    def getTerminationTime(self) -> datetime:
+        return self.getStart() + timedelta(milliseconds=self.getDuration())